@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import random
+import sys
+import time
+import tracemalloc
+from envy.section import ImageSection
+from envy.isa.falcon import FalconIsa
+from envy.isa import vp2macro
+from envy.deco import DecodeError
+from envy.deco import block
+from envy.deco import expr
+from envy.deco.block import Block, TempVar
+from envy.deco.op import DecopAssign
+from envy.deco.expr.const import ExprConst
+from envy.deco.expr.var import ExprVar
+from envy.deco.expr.cmp import ExprEq
+from envy.deco.world import World, Domain
+
+N = 100000
+
+
+def measure(name, make, num=N):
+    # memory and time per object, with whatever it drags along.  The
+    # intern table grows in big steps, so rather than whatever step this
+    # happens to take, interned expressions count what a table of just
+    # them would take.
+    expr.sweep()
+    entries = len(expr.interned)
+    table = sys.getsizeof(expr.interned)
+    tracemalloc.start()
+    start = time.perf_counter()
+    keep = [make(idx) for idx in range(num)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size -= sys.getsizeof(keep)
+    if sys.getsizeof(expr.interned) != table:
+        # grown, tracemalloc saw the new table but not the old one go.
+        size -= sys.getsizeof(expr.interned)
+    size += sys.getsizeof(dict.fromkeys(range(len(expr.interned) - entries)))
+    print("{:<12} {:8.1f} bytes/node {:8.2f} us/node".format(name, size / num, elapsed / num * 1e6))
+
+
+def bench_nodes():
+    names = ['v{}'.format(idx) for idx in range(N + 1)]
+    vars_ = [TempVar(name, 0xffffffff) for name in names]
+    exprs = [ExprVar(var) for var in vars_]
+    isa = FalconIsa(3)
+    code = ImageSection.open(0, 'example.bin')
+    measure('Var', lambda idx: TempVar(names[idx], 0xffffffff))
+    measure('ExprConst', lambda idx: ExprConst(idx + 0x10000))
+    measure('ExprVar', lambda idx: ExprVar(vars_[idx], 0xffff))
+    measure('ExprBin', lambda idx: ExprEq(exprs[idx], exprs[idx + 1]))
+    measure('DecopAssign', lambda idx: DecopAssign(vars_[idx], exprs[idx]))
+    measure('Block', lambda idx: Block('b{}'.format(idx), isa, code, 0, None), N // 100)
+
+
+def chain(isa, code, num):
+    # a block of num dependent r1 = r1 * r2 + r3 steps.
+    res = Block('b', isa, code, 0, 0)
+    r1, r2, r3 = isa.r[1:4]
+    for idx in range(num):
+        val = res.get_reg(r1) * res.get_reg(r2) + res.get_reg(r3)
+        res.set_reg(r1, val, 'b_{:x}'.format(idx))
+    res.clean()
+    return res
+
+
+def fib(isa, code, num):
+    # a block of num steps alternating r0 += r1 and r1 += r0; as trees,
+    # their sizes grow like the Fibonacci numbers.
+    res = Block('b', isa, code, 0, 0)
+    r0, r1 = isa.r[0:2]
+    for idx in range(num):
+        dst, src = (r0, r1) if idx % 2 == 0 else (r1, r0)
+        res.set_reg(dst, res.get_reg(dst) + res.get_reg(src), 'b_{:x}'.format(idx))
+    res.clean()
+    return res
+
+
+def bench_chain():
+    # worst-case expression growth in a block, with and without a fold
+    # budget.  Unbudgeted fib only goes as far as it finishes.
+    isa = FalconIsa(3)
+    code = ImageSection.open(0, 'example.bin')
+    for budget in [None, block.MAX_FOLD_SIZE]:
+        saved = block.MAX_FOLD_SIZE
+        if budget is None:
+            block.MAX_FOLD_SIZE = float('inf')
+        for name, make, nums in [('chain', chain, [8, 16, 32, 64]), ('fib', fib, [8, 16, 24] if budget is None else [8, 16, 24, 64, 256])]:
+            for num in nums:
+                start = time.perf_counter()
+                res = make(isa, code, num)
+                text = '\n'.join(str(op) for op in res.ops)
+                elapsed = time.perf_counter() - start
+                biggest = max(op.src.size for op in res.ops)
+                print("budget {!s:<5} {:<5} {:5} ops {:8.2f} us/op {:8} nodes max {:9} chars".format(budget, name, num, elapsed / num * 1e6, biggest, len(text)))
+        block.MAX_FOLD_SIZE = saved
+
+
+def falcon_world(code):
+    # code at 0 with the function there wanting $r0, like example.py.
+    world = World()
+    section = ImageSection(0, code)
+    isa = FalconIsa(3)
+    domain = Domain(world, isa)
+    world.domains.append(domain)
+    world.sections.append(section)
+    domain.add_section(isa.codemem, section)
+    domain.find_function(0).want_reg(isa.r[0], 0xffffffff)
+    return world
+
+
+def call_chain(nfuncs, steps):
+    # nfuncs functions 0x100 apart, each doing steps of fib on $r0 and
+    # $r1 in Falcon code, then calling the next one.
+    funcs = []
+    for idx in range(nfuncs):
+        # add b32 $r0 $r1; add b32 $r1 $r0
+        body = bytes.fromhex('bb0100bb1000') * (steps // 2)
+        if idx + 1 < nfuncs:
+            body += bytes.fromhex('f521') + (0x100 * (idx + 1)).to_bytes(2, 'little')
+        body += bytes.fromhex('f800')
+        funcs.append(body.ljust(0x100, b'\0'))
+    return b''.join(funcs)
+
+
+def bench_calls():
+    # whole runs, growing the program: a call chain of more and more
+    # functions, each one a fib block.
+    for budget in [None, block.MAX_FOLD_SIZE]:
+        saved = block.MAX_FOLD_SIZE
+        if budget is None:
+            block.MAX_FOLD_SIZE = float('inf')
+        for nfuncs in [4, 16] if budget is None else [4, 16, 64]:
+            world = falcon_world(call_chain(nfuncs, 16))
+            start = time.perf_counter()
+            world.process()
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                world.print()
+            elapsed = time.perf_counter() - start
+            print("budget {!s:<5} {:5} calls {:8.2f} ms/func {:9} chars".format(budget, nfuncs, elapsed / nfuncs * 1e3, len(out.getvalue())))
+        block.MAX_FOLD_SIZE = saved
+
+
+def bench_run():
+    # a whole example.bin run and its printout, peak memory included:
+    # the per-node numbers don't show garbage that waits for a collection.
+    tracemalloc.start()
+    start = time.perf_counter()
+    world = World()
+    code = ImageSection.open(0, 'example.bin')
+    isa = FalconIsa(3)
+    domain = Domain(world, isa)
+    world.domains.append(domain)
+    world.sections.append(code)
+    domain.add_section(isa.codemem, code)
+    domain.find_function(0).want_reg(isa.r[0], 0xffffffff)
+    world.process()
+    with contextlib.redirect_stdout(io.StringIO()):
+        world.print()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("example.bin  {:8.1f} KiB peak {:8.2f} ms".format(peak / 1024, elapsed * 1e3))
+
+
+def vp2_fields(insn):
+    if isinstance(insn, DecodeError):
+        return str(insn)
+    return [insn.pos, insn.end, insn.opcode] + [getattr(insn, name) for name, _, _, _ in vp2macro.FIELDS]
+
+
+def bench_vp2():
+    # batch decode of VP2 macro words, pure Python and with numpy; both
+    # have to give the same fields for every word.  Every 16th word has
+    # random predicate bits, which don't decode.
+    rnd = random.Random(0)
+    words = [rnd.getrandbits(64) if idx % 16 == 0 else rnd.getrandbits(61) << 3 for idx in range(N // 10)]
+    code = ImageSection(0, b''.join(word.to_bytes(8, 'little') for word in words))
+    saved = vp2macro.np
+    res = {}
+    for name, np in [('python', None), ('numpy', saved)]:
+        if name == 'numpy' and np is None:
+            print("vp2 numpy    not installed")
+            continue
+        vp2macro.np = np
+        start = time.perf_counter()
+        insns = vp2macro.isa.decode_range(code, 0, code.end)
+        elapsed = time.perf_counter() - start
+        res[name] = [vp2_fields(insns[pos]) for pos in sorted(insns)]
+        print("vp2 {:<8} {:8.2f} us/word".format(name, elapsed / len(words) * 1e6))
+    vp2macro.np = saved
+    if 'numpy' in res:
+        assert res['numpy'] == res['python']
+        print("vp2 numpy    same fields as python")
+
+bench_nodes()
+bench_run()
+bench_chain()
+bench_calls()
+bench_vp2()
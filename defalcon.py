@@ -1,34 +1,39 @@
 #!/usr/bin/env python3
 
+import os
 from envy.section import ImageSection
 from envy.isa.falcon import FalconIsa
 from envy.deco.world import World, Domain
+from envy.deco.cache import Cache
 
 
 class FalconBin(World):
     fname_data = None
     suffix = None
+    # results are cached as pickles, so only if $ENVY_CACHE names a
+    # directory to keep them in.
+    cachedir = os.environ.get('ENVY_CACHE')
 
     def __init__(self):
         super().__init__()
         print(self.eng + '/' + self.fname_code)
         rsuf = '-' + self.suffix if self.suffix else ''
         pref = self.eng + '/bin-'
-        with open(pref + self.fname_code + rsuf, 'rb') as f:
-            code = ImageSection(0, f.read())
+        code = ImageSection.open(0, pref + self.fname_code + rsuf)
         if self.fname_data:
-            with open(pref + self.fname_data + rsuf, 'rb') as f:
-                data = ImageSection(0, f.read())
+            data = ImageSection.open(0, pref + self.fname_data + rsuf)
         else:
             data = None
         isa = FalconIsa(self.version)
         domain = Domain(self, isa)
         self.domains.append(domain)
         self.sections.append(code)
+        domain.add_section(isa.codemem, code)
         if data:
             self.sections.append(data)
-        domain.add_section(isa.codemem, code)
-        domain.add_section(isa.data, data)
+            domain.add_section(isa.data, data)
+        if self.cachedir:
+            self.cache = Cache(self, self.cachedir)
         for entry, name in self.funcs:
             func = domain.find_function(entry)
             if name:
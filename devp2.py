@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from envy.section import Section
+from envy.section import ImageSection
 from envy.isa.vp2macro import isa as vp2macroisa
 from envy.deco import DecodeError
 from envy.deco.block import Block
@@ -11,11 +11,9 @@ class Vp2Bin:
 
     def __init__(self):
         print(self.fname)
-        with open('vp2/bin-' + self.fname, 'rb') as f:
-            self.bin = f.read()
-        self.code = Section(0xd0000000, self.bin)
+        self.code = ImageSection.open(0xd0000000, 'vp2/bin-' + self.fname)
         data_base = self.code.get(0xd000000c, 4)
-        self.data = Section(0xb0000000, self.bin[data_base - 0xd0000000:])
+        self.data = ImageSection(0xb0000000, self.code[data_base:self.code.end])
         self.macros = []
         if self.macro_tab is not None:
             for entry in range(self.macro_tab.start, self.macro_tab.stop, 0xc):
@@ -26,6 +24,7 @@ class Vp2Bin:
                 print("    {:08x} {:08x} {:08x}".format(code, len_, ptr))
                 if len_:
                     try:
+                        self.code.predecode(vp2macroisa, code, code + len_)
                         block = Block('macro_{:x}'.format(code), vp2macroisa, self.code, code, code + len_)
                         block.print()
                     except DecodeError as err:
@@ -1,4 +1,5 @@
 from collections import Counter
+from itertools import count
 from envy.util import bflmask
 from envy.isa import IsaSubReg
 
@@ -8,31 +9,72 @@ FOLD_TOP = 'top'
 FOLD_OTHER = 'other'
 FOLD_ALL = 'all'
 
+# assigned expressions bigger than this (in tree nodes) don't get folded
+# into their uses, they stay in their temps.
+MAX_FOLD_SIZE = 64
+
+
+class Name:
+    # The name of a value made by the instruction at offset in a block, kept
+    # in pieces until something prints it: most temps die in clean.
+    __slots__ = ('block', 'offset', 'role')
+
+    def __init__(self, block, offset, role=''):
+        self.block = block
+        self.offset = offset
+        self.role = role
+
+    def __add__(self, role):
+        return Name(self.block, self.offset, self.role + role)
+
+    def __str__(self):
+        return '{}_{:x}{}'.format(self.block, self.offset, self.role)
+
+    def __reduce__(self):
+        return Name, (self.block, self.offset, self.role)
+
+
+# numbers vars in creation order, for hashes that don't depend on where
+# things got allocated.
+var_seq = count()
+
 
 class Var:
+    # name is a str or a Name, turned into a str once needed.
+    __slots__ = ('name', 'mask', 'seq')
+
     def __init__(self, name, mask):
         self.name = name
         self.mask = mask
+        self.seq = next(var_seq)
+
+    def __hash__(self):
+        return self.seq
 
     def __repr__(self):
-        return self.name
+        return str(self)
 
     def __str__(self):
-        return self.name
+        name = self.name
+        if not isinstance(name, str):
+            name = self.name = str(name)
+        return name
 
     def __format__(self, conv):
-        return self.name
+        return str(self)
 
 
 class TempVar(Var):
-    pass
+    __slots__ = ()
 
 
 class InVar(Var):
-    pass
+    __slots__ = ()
 
 
 class ParmVar(Var):
+    __slots__ = ('reg',)
+
     def __init__(self, name, reg):
         super().__init__(name, reg.mask)
         self.reg = reg
@@ -42,6 +84,8 @@ class ParmVar(Var):
 
 
 class Block:
+    __slots__ = ('name', 'isa', 'section', 'start', 'end', 'inregs', 'ops', 'regs', 'finalop', 'outregs', 'outs', 'vars', 'locals', 'pending', 'composite')
+
     def __init__(self, name, isa, section, start, limit):
         self.name = name
         self.isa = isa
@@ -55,13 +99,18 @@ class Block:
         self.outs = None
         self.vars = {}
         self.locals = set()
+        # reg: (make, name) for values set with defer_reg not yet looked at.
+        self.pending = {}
+        # IsaSplitReg: what get_reg built for it, until a field changes.
+        self.composite = {}
         pos = self.start
         while self.finalop is None and pos != limit:
             if limit is not None and pos > limit:
                 raise DecodeError("Block limit in the middle of instruction")
-            pos = self.isa.decode('{}_{:x}'.format(self.name, pos - self.start), self, pos)
+            pos = self.isa.decode(Name(self.name, pos - self.start), self, pos)
         self.end = pos
         if self.finalop is None:
+            self.force_regs()
             self.outregs = [self.regs]
             self.outs = [limit]
         self.outs = [out if out != ... else self.end for out in self.outs]
@@ -98,7 +147,7 @@ class Block:
         for op in self.ops:
             op = op.fold(subst, FOLD_ALL)
             #if isinstance(op, DecopAssign) and op.dst in singlevars:
-            if isinstance(op, DecopAssign):
+            if isinstance(op, DecopAssign) and op.src.size_upto(MAX_FOLD_SIZE) <= MAX_FOLD_SIZE:
                 subst[op.dst] = op.src
             newops.append(op)
         self.ops = newops
@@ -117,6 +166,8 @@ class Block:
     def get_reg(self, reg):
         assert self.finalop is None
         if isinstance(reg, (IsaReg, IsaVisibleReg)):
+            if reg in self.pending:
+                self.force_reg(reg)
             if reg in self.regs:
                 return self.encap(self.regs[reg])
             elif reg not in self.inregs:
@@ -127,12 +178,15 @@ class Block:
             else:
                 return self.encap(self.inregs[reg])
         elif isinstance(reg, IsaSplitReg):
+            if reg in self.composite:
+                return self.composite[reg]
             res = ExprConst(0)
             for start, len_, field in reg.fields:
                 if isinstance(field, int):
                     res |= field << start
                 else:
                     res |= self.get_reg(field) << start
+            self.composite[reg] = res
             return res
         elif isinstance(reg, IsaSubReg):
             res = self.get_reg(reg.reg)
@@ -158,12 +212,14 @@ class Block:
         var = TempVar(name, expr.bmask)
         self.locals.add(var)
         self.ops.append(DecopAssign(var, expr))
-        self.vars[var] = expr
+        if expr.size_upto(MAX_FOLD_SIZE) <= MAX_FOLD_SIZE:
+            self.vars[var] = expr
         return var
 
     def set_reg(self, reg, expr, name):
         assert self.finalop is None
         if isinstance(reg, (IsaReg, IsaVisibleReg)):
+            self.pending.pop(reg, None)
             val = self.make_temp(expr, name, reg.dmask)
             if reg in self.inregs and reg not in self.regs and self.inregs[reg] == val:
                 pass
@@ -173,12 +229,18 @@ class Block:
                 if isinstance(reg, IsaVisibleReg):
                     self.ops.append(DecopWrite(reg, self.encap(val)))
                 self.regs[reg] = val
+                if self.composite:
+                    self.drop_composite(reg)
         elif isinstance(reg, IsaSplitReg):
-            for start, len_, field in reg.fields:
-                if isinstance(field, int):
-                    pass
-                else:
-                    self.set_reg(field, expr >> start & bflmask(len_), name + '_' + field.name)
+            if reg in self.composite and expr.fold(self.vars, FOLD_TOP) is self.composite[reg]:
+                # writing back what was read, say a saved $flags.
+                pass
+            else:
+                for start, len_, field in reg.fields:
+                    if isinstance(field, int):
+                        pass
+                    else:
+                        self.set_reg(field, expr >> start & bflmask(len_), name + '_' + field.name)
         elif isinstance(reg, IsaSubReg):
             mask = bflmask(reg.len_) << reg.start
             res = (self.get_reg(reg.reg) & ~mask) | (expr << reg.start & mask)
@@ -186,6 +248,27 @@ class Block:
         else:
             raise DecodeError("unk reg")
 
+    def defer_reg(self, reg, make, name):
+        # set_reg(reg, make(), name), with make only called if something
+        # reads reg before it gets overwritten.  For flags.
+        assert self.finalop is None
+        self.pending[reg] = make, name
+        if self.composite:
+            self.drop_composite(reg)
+
+    def drop_composite(self, reg):
+        for split in list(self.composite):
+            if reg in split.regs:
+                del self.composite[split]
+
+    def force_reg(self, reg):
+        make, name = self.pending.pop(reg)
+        self.set_reg(reg, make(), name)
+
+    def force_regs(self):
+        while self.pending:
+            self.force_reg(next(iter(self.pending)))
+
     def emit_exec(self, name, spec, ins):
         assert self.finalop is None
         #ins = [self.make_temp(in_, name + '_in{}'.format(idx), mask) for (idx, (in_, mask)) in enumerate(zip(ins, spec.imask))]
@@ -211,6 +294,7 @@ class Block:
         self.ops.append(DecopSt(space, sz, addr, src))
 
     def emit_jmp(self, name, addr):
+        self.force_regs()
         #addr = self.make_temp(addr, name + '_addr', self.isa.camask)
         #self.finalop = DecopJmp(self.isa, self.encap(addr))
         self.finalop = DecopJmp(self.isa, addr)
@@ -218,6 +302,7 @@ class Block:
         self.outregs = [self.regs]
 
     def emit_bra(self, name, pred, addr):
+        self.force_regs()
         #addr = self.make_temp(addr, name + '_addr', self.isa.camask)
         #pred = self.make_temp(pred, name + '_pred', 1)
         #self.finalop = DecopBra(self.isa, self.encap(pred), self.encap(addr))
@@ -226,6 +311,7 @@ class Block:
         self.outregs = [self.regs, self.regs]
 
     def emit_call(self, name, addr):
+        self.force_regs()
         #addr = self.make_temp(addr, name + '_addr', self.isa.camask)
         #self.finalop = DecopCall(self.isa, self.encap(addr))
         self.finalop = DecopCall(self.isa, addr)
@@ -233,16 +319,19 @@ class Block:
         self.outregs = [self.regs]
 
     def emit_exit(self):
+        self.force_regs()
         self.finalop = DecopExit()
         self.outs = [None]
         self.outregs = [self.regs]
 
     def emit_ret(self):
+        self.force_regs()
         self.finalop = DecopRet()
         self.outs = [None]
         self.outregs = [self.regs]
 
     def emit_iret(self):
+        self.force_regs()
         self.finalop = DecopIRet()
         self.outs = [None]
         self.outregs = [self.regs]
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import pickle
+
+# bump whenever the analysis results or the shape of the pickled state change.
+CACHE_VERSION = 7
+# results kept per key, for different code under the same name.
+MAX_ENTRIES = 4
+# Function attributes that are not part of a cached result.
+LOCAL = {'deps', 'lifted', 'dirty', 'dirty_reasons', 'inproc', 'seq', 'nprocessed', 'sigver', 'prevsig', 'wanted_regs', 'latewants', 'flowstats', 'constcallees', 'nonconst'}
+
+
+def sig_key(func):
+    # registers only: names change with renames, the address is in the key.
+    args = sorted((reg.name, mask) for reg, (_, mask) in func.args.items())
+    if func.retvals is None:
+        return args, None
+    return args, sorted(reg.name for reg in func.retvals)
+
+
+class Cache:
+    def __init__(self, world, path):
+        self.world = world
+        self.path = path
+        self.links = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def get_links(self):
+        # sections are all in place by the time anything gets processed.
+        if self.links is None:
+            self.links = Links(self.world)
+        return self.links
+
+    def key(self, func):
+        # everything but the code and the callees that goes into a result.
+        isa = func.isa
+        key = (
+            CACHE_VERSION,
+            type(isa).__name__,
+            getattr(isa, 'version', None),
+            self.world.domains.index(func.domain),
+            func.start,
+            sorted((reg.name, mask) for reg, mask in func.wanted_regs.items()),
+            sorted(func.callees.items()),
+            sig_key(func),
+        )
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def code_hash(self, section, ranges):
+        h = hashlib.sha256()
+        for start, end in ranges:
+            h.update(repr((start, end)).encode())
+            h.update(section.data[start - section.base:end - section.base])
+        return h.hexdigest()
+
+    def fname(self, key):
+        return os.path.join(self.path, key + '.pickle')
+
+    def read(self, key):
+        try:
+            with open(self.fname(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception:
+            # torn write or stale pickle, it only gets in the way.
+            try:
+                os.remove(self.fname(key))
+            except OSError:
+                pass
+            return []
+
+    def load(self, func, key):
+        for ranges, digest, used, data in self.read(key):
+            if self.code_hash(func.section, ranges) != digest:
+                continue
+            callees = []
+            for (didx, addr), sig in used:
+                callee = self.world.domains[didx].find_function(addr)
+                if callee is None:
+                    break
+                if not callee.processed and callee not in self.world.waiting and self.world.may_nest():
+                    callee.try_process()
+                if sig_key(callee) != sig:
+                    break
+                callees.append(callee)
+            else:
+                self.hits += 1
+                for callee in callees:
+                    callee.deps.add(func)
+                links = self.get_links()
+                return ranges, unpack(data, links, resolver(self.world, links), func)
+        self.misses += 1
+        return None
+
+    def store(self, func, key, ranges):
+        used = [((self.world.domains.index(callee.domain), callee.start), sig) for callee, sig in func.used.items()]
+        state = {name: val for name, val in vars(func).items() if name not in LOCAL}
+        data = pack(state, self.get_links(), func, byaddr=True)
+        entries = self.read(key)
+        entries.insert(0, (ranges, self.code_hash(func.section, ranges), used, data))
+        tmp = self.fname(key) + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(entries[:MAX_ENTRIES], f)
+        os.replace(tmp, self.fname(key))
+
+from envy.deco.pickling import Links, pack, unpack, resolver
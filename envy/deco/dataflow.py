@@ -0,0 +1,103 @@
+from heapq import heappush, heappop
+
+# after this many visits to one block, its state goes through widen.
+WIDEN_AFTER = 8
+
+
+class Dataflow:
+    # A worklist solver over a function's block graph (the EntryBlock and
+    # its FunBlocks).  Subclasses give join(old, new), the lattice join,
+    # and transfer(block, state), which yields (block, state) pairs to
+    # merge into: successors for forward problems, predecessors for
+    # backward ones.  States are whatever join returns, compared with ==.
+    # Forward problems visit blocks in reverse postorder, backward ones in
+    # postorder, from the exits.  A lattice of infinite height overrides
+    # widen(old, new), which has to get to a fixpoint in finitely many
+    # steps; it's used on a block past WIDEN_AFTER visits.
+    backward = False
+
+    def __init__(self, func):
+        self.func = func
+        self.states = {}
+        self.nvisits = {}
+        self.visits = 0
+        self.updates = 0
+
+    def order(self):
+        # postorder of a DFS along the CFG edges, from the entry going
+        # forward, from the exits (blocks without successors) going
+        # backward; reversed, it's the order to visit in.
+        if self.backward:
+            blocks = sorted(self.func.cblocks.items())
+            roots = [block for _, block in blocks if not self.graph_succs(block)]
+            roots.reverse()
+            succs = self.graph_preds
+        else:
+            roots = [self.func.eblock]
+            succs = self.graph_succs
+        seen = set(roots)
+        post = []
+        for root in roots:
+            stack = [(root, iter(succs(root)))]
+            while stack:
+                block, nexts = stack[-1]
+                for next_ in nexts:
+                    if next_ not in seen:
+                        seen.add(next_)
+                        stack.append((next_, iter(succs(next_))))
+                        break
+                else:
+                    stack.pop()
+                    post.append(block)
+        # whatever the roots don't reach goes after everything else.
+        for addr in sorted(self.func.cblocks):
+            block = self.func.cblocks[addr]
+            if block not in seen:
+                post.insert(0, block)
+        return post[::-1]
+
+    def graph_succs(self, block):
+        return [out for out in block.outs if out is not None]
+
+    def graph_preds(self, block):
+        # sorted, for an order that doesn't depend on the ins set's.
+        return sorted({iblock for iblock, _ in block.ins}, key=lambda iblock: iblock.name)
+
+    def widen(self, old, new):
+        return new
+
+    def merge(self, block, state):
+        if block in self.states:
+            old = self.states[block]
+            new = self.join(old, state)
+            if new == old:
+                return
+            if self.nvisits.get(block, 0) >= WIDEN_AFTER:
+                new = self.widen(old, new)
+                if new == old:
+                    return
+        else:
+            new = state
+        self.updates += 1
+        self.states[block] = new
+        if block not in self.queued:
+            self.queued.add(block)
+            if block not in self.rank:
+                self.rank[block] = len(self.rank)
+            # ranks are unique, blocks never get compared.
+            heappush(self.queue, (self.rank[block], block))
+
+    def run(self, seeds):
+        self.rank = {block: idx for idx, block in enumerate(self.order())}
+        self.queue = []
+        self.queued = set()
+        for block, state in seeds:
+            self.merge(block, state)
+        while self.queue:
+            _, block = heappop(self.queue)
+            self.queued.remove(block)
+            self.visits += 1
+            self.nvisits[block] = self.nvisits.get(block, 0) + 1
+            for target, state in self.transfer(block, self.states[block]):
+                self.merge(target, state)
+        return self.states
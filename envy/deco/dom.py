@@ -0,0 +1,97 @@
+NOTHING = object()
+
+
+class DomTree:
+    # Dominators of everything reachable from root, by Cooper, Harvey and
+    # Kennedy's iterative algorithm over reverse postorder.  succs maps a
+    # node to an iterable of its successors; nodes only need to be hashable.
+    def __init__(self, root, succs):
+        self.root = root
+        self.rpo = self.postorder(root, succs)[::-1]
+        self.index = {node: idx for idx, node in enumerate(self.rpo)}
+        self.preds = {node: [] for node in self.rpo}
+        for node in self.rpo:
+            for succ in succs(node):
+                self.preds[succ].append(node)
+        self.idom = {root: root}
+        changed = True
+        while changed:
+            changed = False
+            for node in self.rpo[1:]:
+                new = NOTHING
+                for pred in self.preds[node]:
+                    if pred in self.idom:
+                        new = pred if new is NOTHING else self.intersect(pred, new)
+                if node not in self.idom or self.idom[node] != new:
+                    self.idom[node] = new
+                    changed = True
+
+    @staticmethod
+    def postorder(root, succs):
+        seen = {root}
+        post = []
+        stack = [(root, iter(succs(root)))]
+        while stack:
+            node, it = stack[-1]
+            for succ in it:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(succs(succ))))
+                    break
+            else:
+                stack.pop()
+                post.append(node)
+        return post
+
+    def intersect(self, a, b):
+        index = self.index
+        while a != b:
+            while index[a] > index[b]:
+                a = self.idom[a]
+            while index[b] > index[a]:
+                b = self.idom[b]
+        return a
+
+    def sizes(self):
+        # number of nodes in each node's subtree, itself included.
+        res = {node: 1 for node in self.rpo}
+        for node in reversed(self.rpo[1:]):
+            res[self.idom[node]] += res[node]
+        return res
+
+
+class Lifting:
+    # Ancestor queries on a tree given by parent and depth maps, by binary
+    # lifting: up[k][node] is the 2**k-th ancestor of node (the root is
+    # its own ancestor).
+    def __init__(self, root, parent, depth):
+        self.depth = depth
+        up = dict(parent)
+        up[root] = root
+        self.up = [up]
+        for _ in range(max(depth.values(), default=0).bit_length()):
+            up = {node: up[up[node]] for node in up}
+            self.up.append(up)
+
+    def ancestor(self, node, dist):
+        k = 0
+        while dist:
+            if dist & 1:
+                node = self.up[k][node]
+            dist >>= 1
+            k += 1
+        return node
+
+    def lca(self, a, b):
+        depth = self.depth
+        if depth[a] > depth[b]:
+            a = self.ancestor(a, depth[a] - depth[b])
+        elif depth[b] > depth[a]:
+            b = self.ancestor(b, depth[b] - depth[a])
+        if a == b:
+            return a
+        for up in reversed(self.up):
+            if up[a] != up[b]:
+                a = up[a]
+                b = up[b]
+        return self.up[0][a]
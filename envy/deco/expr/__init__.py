@@ -1,6 +1,83 @@
+import sys
+from envy.util import slotstate
+
+# hash -> the expression with that hash, or a list of them for the rare
+# hashes shared by several.  The references are strong: a weakref per
+# node would cost more than the node, so sweep() drops what nothing else
+# holds whenever the table has doubled.
+interned = {}
+SWEEP_MIN = 1 << 12
+sweep_at = SWEEP_MIN
+
+# (expr, reason, the values its fvars are bound to) -> what it folds to.
+# A rebound var makes for a different key, nothing has to be forgotten;
+# it's only cleared to bound it.
+fold_memo = {}
+FOLD_MEMO_SIZE = 1 << 10
+
+# fvars are tuples, a lot smaller than frozensets for a few vars.  All
+# expressions without vars share this one.
+NOVARS = ()
+
+
+def union_fvars(exprs):
+    # shares the fvars of a part that has them all.
+    res = NOVARS
+    for expr in exprs:
+        fvars = expr.fvars
+        if not fvars or fvars is res:
+            continue
+        if not res:
+            res = fvars
+            continue
+        merged = set(res)
+        merged.update(fvars)
+        if len(merged) == len(fvars):
+            res = fvars
+        elif len(merged) != len(res):
+            res = tuple(merged)
+    return res
+
+
+# (expr, mask) -> expr.mask(mask), for the sums that mask their parts
+# more than once; nested ones would take exponential time.
+mask_memo = {}
+MASK_MEMO_SIZE = 1 << 10
+
+
+def sweep():
+    # Latest first: a dead expression goes before its parts, which are
+    # older, so a whole dead tree goes in one pass.  An expression
+    # nothing else refers to has three references here: the table, expr
+    # and getrefcount's argument.  The copy at the end is the size of
+    # what's left, dicts don't shrink by themselves.
+    global interned, sweep_at
+    for hash_ in reversed(list(interned)):
+        expr = interned[hash_]
+        if type(expr) is list:
+            expr[:] = [other for other in expr if sys.getrefcount(other) > 3]
+            if not expr:
+                del interned[hash_]
+        elif sys.getrefcount(expr) <= 3:
+            del interned[hash_]
+    interned = dict(interned)
+    sweep_at = max(SWEEP_MIN, len(interned) * 2)
+
+
+def rebuild_expr(cls, state):
+    res = object.__new__(cls)
+    for name, val in state.items():
+        setattr(res, name, val)
+    return res.intern()
+
+
 class Expr:
-    def __init__(self):
-        self.bmask = -1
+    __slots__ = ('bmask', '_hash')
+
+    # all expressions are built in __new__ and interned, there's nothing
+    # left to do here.
+    def __init__(self, *args):
+        pass
 
     def __repr__(self):
         return str(self)
@@ -33,19 +110,94 @@ class Expr:
         return ExprSub(0, self)
 
     def __eq__(self, other):
-        return self.__class__ == other.__class__ and self.__dict__ == other.__dict__
+        return self is other
 
     def __ne__(self, other):
-        return not self.__eq__(other)
+        return self is not other
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # children get rebuilt (and interned) first; the hash and fvars
+        # are recomputed.
+        state = slotstate(self)
+        del state['_hash']
+        state.pop('_fvars', None)
+        return (rebuild_expr, (type(self), state))
+
+    def intern(self):
+        # every subclass has a key(): everything that makes two of them
+        # the same expression, its class first.
+        key = self.key()
+        # classes hash by address, their names don't.
+        hash_ = hash((type(self).__name__,) + key[1:])
+        res = interned.get(hash_)
+        if res is None:
+            if len(interned) >= sweep_at:
+                sweep()
+            interned[hash_] = self
+        elif type(res) is list:
+            for other in res:
+                if other.key() == key:
+                    return other
+            res.append(self)
+        elif res.key() == key:
+            return res
+        else:
+            interned[hash_] = [res, self]
+        self._hash = hash_
+        return self
 
     def mask(self, mask):
+        memo = self, mask
+        res = mask_memo.get(memo)
+        if res is None:
+            if len(mask_memo) >= MASK_MEMO_SIZE:
+                mask_memo.clear()
+            res = mask_memo[memo] = self._mask(mask)
+        return res
+
+    def _mask(self, mask):
         return self
 
+    @property
+    def fvars(self):
+        # the vars in here, found the first time they're asked for.  Only
+        # the inner nodes have a _fvars slot, the leaves override this.
+        try:
+            return self._fvars
+        except AttributeError:
+            self._fvars = res = self.getfvars()
+            return res
+
+    def getfvars(self):
+        return NOVARS
+
+    @property
+    def size(self):
+        # number of nodes when printed as a tree.
+        return self.size_upto(float('inf'))
+
+    def size_upto(self, limit):
+        # size, or anything over limit once it's known to be more.
+        return 1
+
     def fold(self, vars_, reason):
-        return self
+        # nothing to substitute in here.
+        fvars = self.fvars
+        if not fvars or vars_.keys().isdisjoint(fvars):
+            return self
+        key = self, reason, tuple([(var, vars_[var]) for var in fvars if var in vars_])
+        res = fold_memo.get(key)
+        if res is None:
+            if len(fold_memo) >= FOLD_MEMO_SIZE:
+                fold_memo.clear()
+            res = fold_memo[key] = self._fold(vars_, reason)
+        return res
 
-    def __hash__(self):
-        return hash(self.__class__)
+    def _fold(self, vars_, reason):
+        return self
 
     def findvars(self, vars_):
         pass
@@ -58,6 +210,8 @@ class Expr:
 
 
 class ExprBin(Expr):
+    __slots__ = ('e1', 'e2', '_fvars')
+
     def __new__(cls, e1, e2):
         if isinstance(e1, int):
             e1 = ExprConst(e1)
@@ -65,20 +219,38 @@ class ExprBin(Expr):
             e2 = ExprConst(e2)
         return cls.new(e1, e2)
 
-    def __init__(self, e1, e2):
-        super().__init__()
-
     @classmethod
     def new(cls, e1, e2):
+        return cls.make(e1, e2).intern()
+
+    @classmethod
+    def make(cls, e1, e2):
+        # not interned, for nodes that only live to be flattened.
         res = super().__new__(cls)
         res.e1 = e1
         res.e2 = e2
+        res.bmask = res.getbmask()
         return res
 
+    def getbmask(self):
+        return -1
+
+    def key(self):
+        return type(self), self.e1, self.e2
+
     def __str__(self):
         return '(' + str(self.e1) + ' ' + self.op + ' ' + str(self.e2) + ')'
 
-    def fold(self, vars_, reason):
+    def getfvars(self):
+        return union_fvars((self.e1, self.e2))
+
+    def size_upto(self, limit):
+        res = 1 + self.e1.size_upto(limit - 1)
+        if res > limit:
+            return res
+        return res + self.e2.size_upto(limit - res)
+
+    def _fold(self, vars_, reason):
         if reason != FOLD_ALL:
             reason = FOLD_OTHER
         e1 = self.e1.fold(vars_, reason)
@@ -93,9 +265,6 @@ class ExprBin(Expr):
         self.e1.findlivemasks(vars_, -1)
         self.e2.findlivemasks(vars_, -1)
 
-    def __hash__(self):
-        return hash((self.e1, self.e2))
-
 from envy.deco.expr.add import ExprAdd, ExprSub, ExprMul
 from envy.deco.expr.const import ExprConst
 from envy.deco.expr.logop import ExprAnd, ExprOr, ExprXor, ExprShl
@@ -1,10 +1,12 @@
-from envy.deco.expr import ExprBin, Expr
+from envy.deco.expr import ExprBin, Expr, union_fvars
 from envy.deco.expr.const import ExprConst
 from envy.util import lowmask, highmask
 from collections import namedtuple
 
 
 class Part(namedtuple('Part', ['expr', 'mul'])):
+    __slots__ = ()
+
     def __str__(self):
         res = str(self.expr)
         if self.mul > 0:
@@ -17,6 +19,8 @@ class Part(namedtuple('Part', ['expr', 'mul'])):
 
 
 class ExprSum(Expr):
+    __slots__ = ('const', 'parts', '_fvars')
+
     def __new__(cls, expr, mask=-1):
         mask = lowmask(mask)
         self = super().__new__(cls)
@@ -27,10 +31,15 @@ class ExprSum(Expr):
         return self.simplify(mask)
 
     def simplify(self, mask=-1):
-        newparts = []
-        for part in self.parts:
-            newparts.append(Part(part.expr.mask(mask), part.mul))
-        self.parts = newparts
+        parts = self.parts
+        self.parts = []
+        for part in parts:
+            expr = part.expr.mask(mask)
+            if isinstance(expr, (ExprSum, ExprConst)):
+                # masking can leave something to flatten.
+                self._add(expr, mask, part.mul)
+            else:
+                self.parts.append(Part(expr, part.mul))
         self.const &= mask
         self.bmask = highmask(self.const)
         for part in self.parts:
@@ -41,10 +50,10 @@ class ExprSum(Expr):
             part = self.parts[0]
             if part.mul == 1:
                 return part.expr
-        return self
+        return self.intern()
 
-    def __init__(self, *args):
-        pass
+    def key(self):
+        return ExprSum, self.const, tuple(self.parts)
 
     def __str__(self):
         meat = ''.join(map(str, self.parts))
@@ -52,7 +61,18 @@ class ExprSum(Expr):
             meat = '{:#x}'.format(self.const) + meat
         return '(' + meat + ')'
 
-    def fold(self, vars_, reason):
+    def getfvars(self):
+        return union_fvars(part.expr for part in self.parts)
+
+    def size_upto(self, limit):
+        res = 1
+        for part in self.parts:
+            if res > limit:
+                break
+            res += part.expr.size_upto(limit - res)
+        return res
+
+    def _fold(self, vars_, reason):
         if reason != FOLD_ALL:
             reason = FOLD_SUM
         res = super().__new__(type(self))
@@ -98,7 +118,7 @@ class ExprSum(Expr):
             return
         self.parts.append(Part(expr.mask(mask), mul))
 
-    def mask(self, mask):
+    def _mask(self, mask):
         return ExprSum(self, mask)
 
     def as_offset(self):
@@ -113,40 +133,43 @@ class ExprSum(Expr):
 
 
 class ExprAdd(ExprBin):
+    __slots__ = ()
     op = '+'
 
     @classmethod
     def new(cls, e1, e2):
-        return ExprSum(super().new(e1, e2))
+        return ExprSum(cls.make(e1, e2))
 
     def findlivemasks(self, vars_, mask):
         self.e1.findlivemasks(vars_, lowmask(mask))
         self.e2.findlivemasks(vars_, lowmask(mask))
 
-    def mask(self, mask):
+    def _mask(self, mask):
         e1 = self.e1.mask(lowmask(mask))
         e2 = self.e2.mask(lowmask(mask))
         return e1 + e2
 
 
 class ExprSub(ExprBin):
+    __slots__ = ()
     op = '-'
 
     @classmethod
     def new(cls, e1, e2):
-        return ExprSum(super().new(e1, e2))
+        return ExprSum(cls.make(e1, e2))
 
     def findlivemasks(self, vars_, mask):
         self.e1.findlivemasks(vars_, lowmask(mask))
         self.e2.findlivemasks(vars_, lowmask(mask))
 
-    def mask(self, mask):
+    def _mask(self, mask):
         e1 = self.e1.mask(lowmask(mask))
         e2 = self.e2.mask(lowmask(mask))
         return e1 - e2
 
 
 class ExprMul(ExprBin):
+    __slots__ = ()
     op = '*'
 
     @classmethod
@@ -156,10 +179,10 @@ class ExprMul(ExprBin):
         if isinstance(e1, ExprConst):
             e1, e2 = e2, e1
         if isinstance(e2, ExprConst):
-            return ExprSum(super().new(e1, e2))
+            return ExprSum(cls.make(e1, e2))
         return super().new(e1, e2)
 
-    def mask(self, mask):
+    def _mask(self, mask):
         e1 = self.e1.mask(lowmask(mask))
         e2 = self.e2.mask(lowmask(mask))
         return e1 * e2
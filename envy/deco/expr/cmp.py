@@ -3,15 +3,17 @@ from envy.deco.expr.const import ExprConst
 
 
 class ExprBinBool(ExprBin):
-    def __init__(self, e1, e2):
-        super().__init__(e1, e2)
-        self.bmask = 1
+    __slots__ = ()
+
+    def getbmask(self):
+        return 1
 
     def negate(self):
         return self.negtype(self.e1, self.e2)
 
 
 class ExprEq(ExprBinBool):
+    __slots__ = ()
     op = '=='
 
     @classmethod
@@ -22,6 +24,7 @@ class ExprEq(ExprBinBool):
 
 
 class ExprNe(ExprBinBool):
+    __slots__ = ()
     op = '!='
 
     @classmethod
@@ -32,6 +35,7 @@ class ExprNe(ExprBinBool):
 
 
 class ExprLt(ExprBinBool):
+    __slots__ = ()
     op = '<'
 
     @classmethod
@@ -42,6 +46,7 @@ class ExprLt(ExprBinBool):
 
 
 class ExprGe(ExprBinBool):
+    __slots__ = ()
     op = '>='
 
     @classmethod
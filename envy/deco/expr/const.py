@@ -1,17 +1,26 @@
-from envy.deco.expr import Expr
+from envy.deco.expr import Expr, NOVARS
 
 
 class ExprConst(Expr):
-    def __init__(self, val):
-        super().__init__()
+    __slots__ = ('val',)
+    fvars = NOVARS
+
+    def __new__(cls, val):
+        # comparisons give bools, which would intern as the same key as 0
+        # and 1.
+        val = int(val)
+        self = super().__new__(cls)
         self.val = val
         self.bmask = val
+        return self.intern()
+
+    def key(self):
+        return ExprConst, self.val
 
     def mask(self, mask):
+        if self.val & mask == self.val:
+            return self
         return ExprConst(self.val & mask)
 
     def __str__(self):
         return hex(self.val)
-
-    def __hash__(self):
-        return hash(self.val)
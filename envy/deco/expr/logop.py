@@ -1,10 +1,12 @@
-from envy.deco.expr import ExprBin, Expr
+from envy.deco.expr import ExprBin, Expr, union_fvars
 from envy.deco.expr.const import ExprConst
 from envy.util import bflmask, sext, shl
 from collections import namedtuple
 
 
 class Bitfield(namedtuple('Bitfield', ['expr', 'sign', 'shift', 'mask'])):
+    __slots__ = ()
+
     def __str__(self):
         res = str(self.expr)
         if self.sign is not None:
@@ -19,6 +21,8 @@ class Bitfield(namedtuple('Bitfield', ['expr', 'sign', 'shift', 'mask'])):
 
 
 class ExprBigOr(Expr):
+    __slots__ = ('const', 'bitfields', '_fvars')
+
     def __new__(cls, expr, mask=-1):
         self = super().__new__(cls)
         self.const = 0
@@ -43,10 +47,11 @@ class ExprBigOr(Expr):
             bf = self.bitfields[0]
             if bf.mask == -1 and bf.sign is None and bf.shift == 0:
                 return bf.expr
-        return self
+        return self.intern()
 
-    def __init__(self, *args):
-        pass
+    def key(self):
+        # bmask isn't quite derivable from the rest, see simplify.
+        return ExprBigOr, self.const, self.bmask, tuple(self.bitfields)
 
     def __str__(self):
         meat = ' | '.join(map(str, self.bitfields))
@@ -54,7 +59,18 @@ class ExprBigOr(Expr):
             meat += ' | {:#x}'.format(self.const)
         return '(' + meat + ')'
 
-    def fold(self, vars_, reason):
+    def getfvars(self):
+        return union_fvars(bf.expr for bf in self.bitfields)
+
+    def size_upto(self, limit):
+        res = 1
+        for bf in self.bitfields:
+            if res > limit:
+                break
+            res += bf.expr.size_upto(limit - res)
+        return res
+
+    def _fold(self, vars_, reason):
         if reason != FOLD_ALL:
             reason = FOLD_BIGOR
         res = super().__new__(type(self))
@@ -142,7 +158,7 @@ class ExprBigOr(Expr):
         self.bmask |= shl(sext(expr.bmask, sign), shift) & mask
         self.bitfields.append(Bitfield(expr, sign, shift, mask))
 
-    def mask(self, mask):
+    def _mask(self, mask):
         return ExprBigOr(self, mask)
 
     def as_offset(self):
@@ -159,6 +175,7 @@ class ExprBigOr(Expr):
 
 
 class ExprShl(ExprBin):
+    __slots__ = ()
     op = '<<'
 
     @classmethod
@@ -168,11 +185,12 @@ class ExprShl(ExprBin):
         if isinstance(e2, ExprConst):
             if e2.val == 0:
                 return e1
-            return ExprBigOr(super().new(e1, e2))
+            return ExprBigOr(cls.make(e1, e2))
         return super().new(e1, e2)
 
 
 class ExprAnd(ExprBin):
+    __slots__ = ()
     op = '&'
 
     @classmethod
@@ -184,10 +202,10 @@ class ExprAnd(ExprBin):
         if isinstance(e1, ExprConst):
             e1, e2 = e2, e1
         if isinstance(e2, ExprConst):
-            return ExprBigOr(super().new(e1, e2))
+            return ExprBigOr(cls.make(e1, e2))
         return super().new(e1, e2)
 
-    def mask(self, mask):
+    def _mask(self, mask):
         e1 = self.e1.mask(mask)
         e2 = self.e2.mask(mask)
         return e1 & e2
@@ -198,17 +216,17 @@ class ExprAnd(ExprBin):
 
 
 class ExprOr(ExprBin):
+    __slots__ = ()
     op = '|'
 
     @classmethod
     def new(cls, e1, e2):
-        return ExprBigOr(super().new(e1, e2))
+        return ExprBigOr(cls.make(e1, e2))
 
-    def __init__(self, e1, e2):
-        super().__init__(e1, e2)
-        self.bmask = self.e1.bmask | self.e2.bmask
+    def getbmask(self):
+        return self.e1.bmask | self.e2.bmask
 
-    def mask(self, mask):
+    def _mask(self, mask):
         e1 = self.e1.mask(mask)
         e2 = self.e2.mask(mask)
         return e1 | e2
@@ -219,6 +237,8 @@ class ExprOr(ExprBin):
 
 
 class ExprBigXor(Expr):
+    __slots__ = ('const', 'exprs', '_fvars')
+
     def __new__(cls, expr, mask=-1):
         self = super().__new__(cls)
         self.const = 0
@@ -239,18 +259,29 @@ class ExprBigXor(Expr):
                     self.exprs ^= {expr, expr.negate()}
         if not self.const and len(self.exprs) == 1:
             return list(self.exprs)[0]
-        return self
+        return self.intern()
 
-    def __init__(self, *args):
-        pass
+    def key(self):
+        return ExprBigXor, self.const, frozenset(self.exprs)
 
     def __str__(self):
-        meat = ' ^ '.join(map(str, self.exprs))
+        meat = ' ^ '.join(sorted(map(str, self.exprs)))
         if self.const:
             meat += ' ^ {:#x}'.format(self.const)
         return '(' + meat + ')'
 
-    def fold(self, vars_, reason):
+    def getfvars(self):
+        return union_fvars(self.exprs)
+
+    def size_upto(self, limit):
+        res = 1
+        for expr in self.exprs:
+            if res > limit:
+                break
+            res += expr.size_upto(limit - res)
+        return res
+
+    def _fold(self, vars_, reason):
         if reason != FOLD_ALL:
             reason = FOLD_BIGOR
         res = super().__new__(type(self))
@@ -286,22 +317,22 @@ class ExprBigXor(Expr):
             return
         self.exprs ^= {expr}
 
-    def mask(self, mask):
+    def _mask(self, mask):
         return ExprBigXor(self, mask)
 
 
 class ExprXor(ExprBin):
+    __slots__ = ()
     op = '^'
 
     @classmethod
     def new(cls, e1, e2):
-        return ExprBigXor(super().new(e1, e2))
+        return ExprBigXor(cls.make(e1, e2))
 
-    def __init__(self, e1, e2):
-        super().__init__(e1, e2)
-        self.bmask = self.e1.bmask | self.e2.bmask
+    def getbmask(self):
+        return self.e1.bmask | self.e2.bmask
 
-    def mask(self, mask):
+    def _mask(self, mask):
         e1 = self.e1.mask(mask)
         e2 = self.e2.mask(mask)
         return e1 ^ e2
@@ -312,12 +343,13 @@ class ExprXor(ExprBin):
 
 
 class ExprSext(ExprBin):
+    __slots__ = ()
     @classmethod
     def new(cls, e1, e2):
         if isinstance(e1, ExprConst) and isinstance(e2, ExprConst):
             return ExprConst(sext(e1.val, e2.val))
         if isinstance(e2, ExprConst):
-            return ExprBigOr(super().new(e1, e2))
+            return ExprBigOr(cls.make(e1, e2))
         return super().new(e1, e2)
 
     def __str__(self):
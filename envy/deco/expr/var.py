@@ -2,19 +2,27 @@ from envy.deco.expr import Expr
 
 
 class ExprVar(Expr):
-    def __init__(self, var, omask=-1):
-        super().__init__()
+    __slots__ = ('var', 'omask')
+
+    def __new__(cls, var, omask=-1):
+        self = super().__new__(cls)
         self.var = var
         self.bmask = var.mask
         self.omask = omask & var.mask
+        return self.intern()
+
+    def key(self):
+        return ExprVar, self.var, self.omask
 
     def __str__(self):
-        return self.var.name
+        return str(self.var)
 
-    def __hash__(self):
-        return hash(self.var.name)
+    @property
+    def fvars(self):
+        # built when asked for, there's one of these per var and mask.
+        return (self.var,)
 
-    def fold(self, vars_, reason):
+    def _fold(self, vars_, reason):
         if self.var not in vars_:
             return self
         val = vars_[self.var]
@@ -35,13 +43,15 @@ class ExprVar(Expr):
         return self
 
     def mask(self, mask):
+        if self.omask & mask == self.omask:
+            return self
         return ExprVar(self.var, self.omask & mask)
 
     def findvars(self, vars_):
         vars_[self.var] += 1
 
     def findlivemasks(self, vars_, mask):
-        vars_[self.var] |= mask
+        vars_.append((self.var, mask))
 
 from envy.deco.expr.logop import ExprBigOr
 from envy.deco.expr.add import ExprSum
@@ -1,4 +1,6 @@
-from envy.deco.object import Object
+from envy.deco.object import Object, DIRTY_CODE, DIRTY_CALLS, DIRTY_WANTED
+from envy.deco.dataflow import Dataflow
+from envy.deco.dom import DomTree, Lifting
 from collections import Counter
 
 
@@ -60,12 +62,64 @@ def print_phi(depth, outregs, out):
             print("    " * depth + "{} = {}".format(out.inregs[reg], outregs[reg]))
 
 
+class LiveMasks:
+    # var -> live bit mask for a whole function.  The vars are numbered
+    # densely as they're first marked, the masks and the block each was
+    # found in (the one with its def) are in flat lists by that number.
+    __slots__ = ('ids', 'vars', 'masks', 'blocks')
+
+    def __init__(self):
+        self.ids = {}
+        self.vars = []
+        self.masks = []
+        self.blocks = []
+
+    def number(self, var, block):
+        idx = self.ids.get(var)
+        if idx is None:
+            idx = self.ids[var] = len(self.vars)
+            self.vars.append(var)
+            self.masks.append(0)
+            self.blocks.append(block)
+        return idx
+
+    def __getitem__(self, var):
+        idx = self.ids.get(var)
+        if idx is None:
+            return 0
+        return self.masks[idx]
+
+    def __contains__(self, var):
+        return var in self.ids
+
+    def __delitem__(self, var):
+        # its slots just go unused.
+        del self.ids[var]
+
+    def add(self, var, block, mask):
+        self.masks[self.number(var, block)] |= mask
+
+    def inblock(self, block):
+        for var, idx in self.ids.items():
+            if self.blocks[idx] is block:
+                yield var
+
+
+def rebuild_block(cls, name):
+    res = cls.__new__(cls)
+    res.name = name
+    return res
+
+
 class EntryBlock:
+    __slots__ = ('func', 'name', 'outs', 'localdefs', 'outregs', 'loop', 'join', 'brk', 'used', 'label')
+    # the parms are live or not, nothing comes before them.
+    ins = ()
+
     def __init__(self, func, entry):
         self.func = func
         self.name = func.name + '_entry'
         self.outs = [entry]
-        self.livevars = Counter()
         self.localdefs = {}
         self.outregs = [{reg: ParmVar(func.name + '_parm_' + reg.name, reg) for reg in entry.inregs}]
         self.loop = None
@@ -81,6 +135,10 @@ class EntryBlock:
     def __hash__(self):
         return hash(self.name)
 
+    def __reduce__(self):
+        # hashed by name, which must exist before the ins sets are rebuilt.
+        return (rebuild_block, (type(self), self.name), (None, slotstate(self)))
+
     def get_out(self, idx, reg):
         if reg not in self.outregs[idx]:
             var = ParmVar(self.func.name + '_parm_' + reg.name, reg)
@@ -88,14 +146,15 @@ class EntryBlock:
             self.localdefs[var] = reg
         return self.outregs[idx][reg]
 
-    def mark_live_out(self, idx, reg, mask):
+    def live_out(self, idx, reg, mask):
         if reg not in self.outregs[idx]:
             var = ParmVar(self.func.name + '_parm_' + reg.name, reg)
             self.outregs[idx][reg] = var
             self.localdefs[var] = reg
         else:
             var = self.outregs[idx][reg]
-        self.livevars[var] |= mask & reg.mask
+        self.func.livevars.add(var, self, mask & reg.mask)
+        return None
 
     def print(self):
         print("    {}:".format(self.name))
@@ -106,14 +165,17 @@ class EntryBlock:
                 print("        OUT -> {}".format(out))
             for reg, var in regs.items():
                 print("            OUT {} {:#x}".format(reg, var))
-        for var in self.livevars:
-            print("        LIVE {} {:x}".format(var, self.livevars[var]))
+        livevars = self.func.livevars
+        for var in livevars.inblock(self):
+            print("        LIVE {} {:x}".format(var, livevars[var]))
 
     def sprint(self, depth):
         print_phi(depth, self.outregs[0], self.outs[0])
 
 
 class FunBlock:
+    __slots__ = ('func', 'name', 'start', 'end', 'inregs', 'ops', 'finalop', 'outs', 'ins', 'localdefs', 'outregs', 'loop', 'join', 'brk', 'used', 'label')
+
     def __init__(self, func, block):
         self.func = func
         self.name = block.name
@@ -125,7 +187,6 @@ class FunBlock:
         self.outs = block.outs[:]
         self.ins = set()
         self.localdefs = {}
-        self.livevars = Counter()
         self.outregs = [regs.copy() for regs in block.outregs]
         self.loop = None
         self.join = None
@@ -146,23 +207,9 @@ class FunBlock:
     def __hash__(self):
         return hash(self.name)
 
-    def mark_live_var(self, var, mask):
-        mask &= var.mask
-        curmask = self.livevars[var]
-        if curmask | mask == curmask:
-            return
-        self.livevars[var] |= mask
-        def_ = self.localdefs[var]
-        if isinstance(def_, DecopAssign):
-            subvars = Counter()
-            def_.src.findlivemasks(subvars, mask)
-            for var in subvars:
-                self.mark_live_var(var, subvars[var])
-        elif isinstance(def_, Decop):
-            pass
-        elif def_ is not None:
-            for block, idx in self.ins:
-                block.mark_live_out(idx, def_, mask)
+    def __reduce__(self):
+        # hashed by name, which must exist before the ins sets are rebuilt.
+        return (rebuild_block, (type(self), self.name), (None, slotstate(self)))
 
     def get_in(self, reg):
         if reg not in self.inregs:
@@ -176,25 +223,34 @@ class FunBlock:
             self.outregs[idx][reg] = self.get_in(reg)
         return self.outregs[idx][reg]
 
-    def mark_live_out(self, idx, reg, mask):
+    def live_out(self, idx, reg, mask):
+        # the var that has to be live for reg to be live going out, if any.
         mask &= reg.mask
         if isinstance(self.finalop, DecopRetCall):
-            self.finalop.fsig.want_reg(reg, mask)
+            self.func.call_want_reg(self.finalop.fsig, reg, mask)
         val = self.get_out(idx, reg)
         if not isinstance(val, int):
-            self.mark_live_var(self.outregs[idx][reg], mask)
+            return self.outregs[idx][reg]
+        return None
 
-    def mark_live_roots(self):
+    def live_roots(self):
+        # var -> mask live whatever the rest does: what's returned, and
+        # what every op but the assigns reads.
+        marks = []
         if isinstance(self.finalop, DecopRet):
             for reg in self.func.wanted_regs:
-                self.mark_live_out(0, reg, self.func.wanted_regs[reg])
-        subvars = Counter()
+                mask = self.func.wanted_regs[reg]
+                var = self.live_out(0, reg, mask)
+                if var is not None:
+                    marks.append((var, mask & reg.mask))
         for op in self.ops:
             if not isinstance(op, DecopAssign):
-                op.findlivemasks(subvars)
-        self.finalop.findlivemasks(subvars)
-        for var in subvars:
-            self.mark_live_var(var, subvars[var])
+                op.findlivemasks(marks)
+        self.finalop.findlivemasks(marks)
+        roots = {}
+        for var, mask in marks:
+            roots[var] = roots.get(var, 0) | mask
+        return roots
 
     def substvars(self, subst):
         self.ops = [op.substvars(subst) for op in self.ops]
@@ -209,12 +265,12 @@ class FunBlock:
                 for iblock, idx in self.ins:
                     if reg in iblock.outregs[idx]:
                         del iblock.outregs[idx][reg]
+        # whatever replaces a var is live at its own def already, the
+        # liveness went there through this one.
+        livevars = self.func.livevars
         for var in subst:
-            if self.livevars[var]:
-                mask = self.livevars[var]
-                del self.livevars[var]
-                if isinstance(subst[var], Var):
-                    self.livevars[subst[var]] |= mask
+            if var in livevars:
+                del livevars[var]
 
     def print(self):
         print("    {}:".format(self.name))
@@ -239,8 +295,9 @@ class FunBlock:
                 print("        OUT -> {}".format(out))
             for reg, var in regs.items():
                 print("            OUT {} {:#x}".format(reg, var))
-        for var in self.livevars:
-            print("        LIVE {} {:x}".format(var, self.livevars[var]))
+        livevars = self.func.livevars
+        for var in livevars.inblock(self):
+            print("        LIVE {} {:x}".format(var, livevars[var]))
 
     def sprint(self, depth, outs=None, join=None):
         if self.label:
@@ -275,6 +332,102 @@ class FunBlock:
                 sout.sprint(depth + 1)
 
 
+class SpOffsets(Dataflow):
+    # which registers hold the entry sp plus a known offset; None if
+    # the offset depends on the path taken.  A register's entry only goes
+    # from missing to an offset to None, so there's nothing to widen.
+    def __init__(self, func, spmask):
+        super().__init__(func)
+        self.spmask = spmask
+        self.offsets = {}
+
+    def join(self, old, new):
+        res = dict(old)
+        for reg, off in new.items():
+            if reg not in res:
+                res[reg] = off
+            elif res[reg] != off:
+                res[reg] = None
+        return res
+
+    def transfer(self, block, state):
+        newoff = {}
+        for reg, off in state.items():
+            ivar = block.get_in(reg)
+            newoff[ivar] = off
+            self.offsets[ivar] = off
+        for op in block.ops:
+            if not isinstance(op, DecopAssign):
+                continue
+            aconv = op.src.as_offset()
+            if aconv is None:
+                continue
+            avar, aoff, amask = aconv
+            if avar not in newoff:
+                continue
+            # XXX not correct
+            if amask | self.spmask != amask:
+                continue
+            if newoff[avar] is None:
+                newoff[op.dst] = None
+            else:
+                newoff[op.dst] = (newoff[avar] + aoff) & lowmask(self.spmask)
+            self.offsets[op.dst] = newoff[op.dst]
+        for out, regs in zip(block.outs, block.outregs):
+            if out is not None:
+                outoff = {reg: newoff[regs[reg]] for reg in regs if regs[reg] in newoff}
+                if outoff:
+                    yield out, outoff
+
+
+class Liveness(Dataflow):
+    # backward, the state of a block is its vars live so far, var ->
+    # mask.  The masks themselves go in the function's LiveMasks, only
+    # the bits new there are followed: to the vars an assign reads, and
+    # for an InVar, to the preds' outs.  Masks only grow and are bounded.
+    backward = True
+
+    def __init__(self, func):
+        super().__init__(func)
+        self.livevars = func.livevars
+
+    def join(self, old, new):
+        res = dict(old)
+        for var, mask in new.items():
+            res[var] = res.get(var, 0) | mask
+        return res
+
+    def transfer(self, block, state):
+        livevars = self.livevars
+        work = list(state.items())
+        work.reverse()
+        marks = []
+        preds = {}
+        while work:
+            var, mask = work.pop()
+            mask &= var.mask
+            idx = livevars.number(var, block)
+            cur = livevars.masks[idx]
+            if cur | mask == cur:
+                continue
+            livevars.masks[idx] = cur | mask
+            def_ = block.localdefs[var]
+            if isinstance(def_, DecopAssign):
+                def_.src.findlivemasks(marks, mask)
+                marks.reverse()
+                work += marks
+                marks.clear()
+            elif isinstance(def_, Decop):
+                pass
+            elif def_ is not None:
+                for pblock, pidx in block.ins:
+                    pvar = pblock.live_out(pidx, def_, mask)
+                    if pvar is not None:
+                        pstate = preds.setdefault(pblock, {})
+                        pstate[pvar] = pstate.get(pvar, 0) | mask & def_.mask
+        return preds.items()
+
+
 class Function(Object):
     def __init__(self, name, domain, start):
         super().__init__(domain.world)
@@ -288,30 +441,91 @@ class Function(Object):
         self.livecheck = False
         self.structure = None
         self.cblocks = None
+        self.eblock = None
+        self.livevars = None
+        self.leaders = None
+        # Blocks by (name, start, limit), kept while a callee may still
+        # change the CFG.
+        self.lifted = {}
         self.processed = False
         self.wanted_regs = Counter()
+        # wanted by recursive calls while we run, for after.
+        self.latewants = Counter()
         self.callees = {}
+        # callees resolved from constant args, None where taken back.
+        self.constcallees = {}
+        self.nonconst = set()
         self.args = {}
         self.retvals = None
+        self.used = {}
+        self.callwants = []
+        self.flowstats = Counter()
         self.mark_dirty()
 
+    def run(self):
+        super().run()
+        wants = self.latewants
+        self.latewants = Counter()
+        for reg, mask in wants.items():
+            self.want_reg(reg, mask)
+
     def want_reg(self, reg, mask):
+        if self.inproc:
+            self.latewants[reg] |= mask
+            return
         newmask = self.wanted_regs[reg] | mask
         if self.wanted_regs[reg] != newmask:
             self.wanted_regs[reg] |= mask
-            self.mark_dirty()
+            self.mark_dirty(DIRTY_WANTED)
+
+    def call_want_reg(self, func, reg, mask):
+        self.callwants.append((func, reg, mask))
+        func.want_reg(reg, mask)
 
     def process(self):
+        reasons = self.dirty_reasons
+        self.dirty_reasons = set()
+        ndeferred = self.world.ndeferred
+        if DIRTY_CODE in reasons:
+            self.lifted = {}
+            self.leaders = None
+        self.drop_blocks()
+        cache = self.world.cache
+        if cache is not None:
+            key = cache.key(self)
+            hit = cache.load(self, key)
+            if hit is not None:
+                self.restore(*hit)
+                return
         self.error = None
         self.connected = False
         self.livecheck = False
         self.structure = None
         self.cblocks = None
+        self.used = {}
+        self.callwants = []
+        error = None
         try:
-            self.find_blocks()
+            # a wanted_regs change alone can't change the CFG, reuse it.
+            if DIRTY_CALLS in reasons or not self.rebuild_blocks():
+                self.find_blocks()
         except DecodeError as err:
-            self.error = err
+            error = err
+        if self.world.ndeferred != ndeferred:
+            # a callee got deferred, here or in a nested run: what we'd
+            # make of it now, a nested run wouldn't have seen.  Give up,
+            # World.run reruns us after it.
+            self.drop_blocks()
+            self.section.set_ranges(self, [])
+            self.dirty_reasons |= reasons - {DIRTY_CODE}
+            self.mark_dirty(DIRTY_CALLS)
+            return
+        if error is not None:
+            self.error = error
+            self.section.set_ranges(self, [])
             return
+        ranges = self.covered_ranges()
+        self.section.set_ranges(self, ranges)
         try:
             self.connect_blocks()
             self.findlive()
@@ -321,40 +535,165 @@ class Function(Object):
             self.forward_ins()
             self.find_const_calls()
             self.clean_preserved()
-            self.update_sig((self.args, self.retvals))
+            self.update_sig(self.sig())
             self.structuralize()
         except ConnectError as err:
             self.error = err
         self.processed = True
+        if all(func.processed and not func.dirty for func in self.used):
+            # only wants can rerun us now, and the leaders do for those.
+            self.lifted = {}
+        if cache is not None:
+            cache.store(self, key, ranges)
+
+    def drop_blocks(self):
+        # the old CFG is all cycles, unlinked it goes away right now instead
+        # of waiting for the collector.
+        if self.cblocks is None:
+            return
+        for block in self.cblocks.values():
+            block.ins = None
+        for block in [self.eblock, *self.cblocks.values()]:
+            if block is not None:
+                block.outs = block.loop = block.join = block.brk = None
+        self.cblocks = None
+        self.eblock = None
+        self.livevars = None
+
+    def restore(self, ranges, state):
+        # replay the effects a real run would have had on everyone else.
+        # args, retvals and callees only ever grow and are updated in place,
+        # like process does.
+        args = state.pop('args')
+        retvals = state.pop('retvals')
+        callees = state.pop('callees')
+        self.__dict__.update(state)
+        self.section.set_ranges(self, ranges)
+        for func, reg, mask in self.callwants:
+            func.want_reg(reg, mask)
+        if callees.keys() - self.callees.keys():
+            self.callees.update(callees)
+            self.mark_dirty(DIRTY_CALLS)
+        self.args.update(args)
+        if self.retvals is None:
+            self.retvals = retvals
+        elif retvals is not None:
+            self.retvals.update(retvals)
+        self.update_sig(self.sig())
+
+    def sig(self):
+        # by value, args and retvals are updated in place.
+        args = {reg: mask for reg, (_, mask) in self.args.items()}
+        if self.retvals is None:
+            return args, None
+        return args, dict(self.retvals)
+
+    def uses_sig(self, func, old, new):
+        # every call passes all the args, and returning at all changes our
+        # CFG.  Past that, only the returned regs we read after a call.
+        if old is None or old[0] != new[0] or old[1] is None or new[1] is None:
+            return True
+        for callee, reg, mask in self.callwants:
+            if callee is func and old[1].get(reg) != new[1].get(reg):
+                return True
+        return False
+
+    def covered_ranges(self):
+        if isinstance(self.error, DecodeError) or self.cblocks is None:
+            return []
+        return [(block.start, block.end) for block in self.cblocks.values()]
 
     def find_blocks(self):
         blocks = {self.start}
         queue = [self.start]  # yes, it's a stack.
         while queue:
             addr = queue.pop()
-            block = FunBlock(self, Block(self.name + '_{:x}'.format(addr), self.isa, self.section, addr, None))
-            self.process_calls(block)
-            for out in block.outs:
+            for out in self.scan_block(addr):
                 if out is not None and out not in blocks:
                     blocks.add(out)
                     queue.append(out)
+        self.leaders = None
         blocks = sorted(blocks)
         self.cblocks = {}
         for addr, naddr in zip(blocks, blocks[1:] + [None]):
-            self.cblocks[addr] = FunBlock(self, Block(self.name + '_{:x}'.format(addr), self.isa, self.section, addr, naddr))
+            self.cblocks[addr] = self.make_block(addr, naddr)
             self.process_calls(self.cblocks[addr])
+        self.leaders = blocks
+
+    def rebuild_blocks(self):
+        if self.leaders is None:
+            return False
+        self.cblocks = {}
+        for addr, naddr in zip(self.leaders, self.leaders[1:] + [None]):
+            self.cblocks[addr] = self.make_block(addr, naddr)
+            self.process_calls(self.cblocks[addr])
+        # a callee processed meanwhile may have changed our CFG after all.
+        seen = {self.start}
+        queue = [self.start]
+        while queue:
+            for out in self.cblocks[queue.pop()].outs:
+                if out is None or out in seen:
+                    continue
+                if out not in self.cblocks:
+                    return False
+                seen.add(out)
+                queue.append(out)
+        return len(seen) == len(self.cblocks)
+
+    def make_block(self, addr, limit):
+        key = self.name, addr, limit
+        if key not in self.lifted:
+            self.lifted[key] = Block(self.name + '_{:x}'.format(addr), self.isa, self.section, addr, limit)
+        return FunBlock(self, self.lifted[key])
+
+    def scan_block(self, addr):
+        pos = addr
+        while True:
+            insn = self.section.decode(self.isa, pos)
+            if insn.cf == ISA_CF_NONE:
+                pos = insn.end
+            elif insn.cf == ISA_CF_JMP:
+                return [insn.target]
+            elif insn.cf == ISA_CF_BRA:
+                return [insn.target, insn.end]
+            elif insn.cf == ISA_CF_CALL and insn.target is not None:
+                func = self.resolve_call(insn.target, insn.end)
+                if func is None or func.retvals is None:
+                    return [None]
+                return [insn.end]
+            elif insn.cf == ISA_CF_CALL:
+                # need the folded address, lift it.
+                block = self.make_block(addr, None)
+                self.process_calls(block)
+                return block.outs
+            else:
+                return [None]
+
+    def resolve_call(self, addr, end):
+        func = None
+        if addr is not None:
+            func = self.domain.find_function(addr)
+        elif end in self.callees:
+            func = self.domain.find_function(self.callees[end])
+        if func is not None:
+            if func.processed or func in self.world.waiting:
+                pass
+            elif self.world.may_nest():
+                func.try_process()
+            else:
+                func.defer()
+            func.deps.add(self)
+            if func not in self.used:
+                self.used[func] = sig_key(func)
+        return func
 
     def process_calls(self, block):
         if isinstance(block.finalop, DecopCall):
-            func = None
             if isinstance(block.finalop.addr, ExprConst):
-                func = self.domain.find_function(block.finalop.addr.val)
-            elif block.end in self.callees:
-                func = self.domain.find_function(self.callees[block.end])
+                func = self.resolve_call(block.finalop.addr.val, block.end)
+            else:
+                func = self.resolve_call(None, block.end)
             if func is not None:
-                if not func.processed:
-                    func.try_process()
-                func.deps.add(self)
                 args = {reg: Block.encap(block.get_out(0, reg)) for reg in func.args}
                 if func.retvals is None:
                     block.outs[0] = None
@@ -373,6 +712,7 @@ class Function(Object):
     def connect_blocks(self):
         entry = self.cblocks[self.start]
         self.eblock = EntryBlock(self, entry)
+        self.livevars = LiveMasks()
         entry.ins.add((self.eblock, 0))
         for block in self.cblocks.values():
             for idx in range(len(block.outs)):
@@ -392,43 +732,12 @@ class Function(Object):
         if self.isa.stackptr not in self.eblock.outregs[0]:
             return
         osp = self.eblock.get_out(0, self.isa.stackptr)
-        offsets = {}
-        queue = []
-        offsets[osp] = 0
-        queue.append((self.eblock.outs[0], self.isa.stackptr, 0))
         spmask = self.isa.stackptr.mask
-        while queue:
-            block, reg, off = queue.pop()
-            ivar = block.get_in(reg)
-            if ivar not in offsets:
-                offsets[ivar] = off
-            elif offsets[ivar] != off and offsets[ivar] is not None:
-                offsets[ivar] = None
-            else:
-                continue
-            newoff = {ivar: offsets[ivar]}
-            for op in block.ops:
-                if not isinstance(op, DecopAssign):
-                    continue
-                aconv = op.src.as_offset()
-                if aconv is None:
-                    continue
-                avar, aoff, amask = aconv
-                if avar not in newoff:
-                    continue
-                # XXX not correct
-                if amask | spmask != amask:
-                    continue
-                if newoff[avar] is None:
-                    newoff[op.dst] = None
-                else:
-                    newoff[op.dst] = (newoff[avar] + aoff) & lowmask(spmask)
-                offsets[op.dst] = newoff[op.dst]
-            for out, regs in zip(block.outs, block.outregs):
-                if out is not None:
-                    for reg in regs:
-                        if regs[reg] in newoff:
-                            queue.append((out, reg, newoff[regs[reg]]))
+        flow = SpOffsets(self, spmask)
+        flow.offsets[osp] = 0
+        flow.run([(self.eblock.outs[0], {self.isa.stackptr: 0})])
+        self.flowstats['sp'] += flow.visits
+        offsets = flow.offsets
         for block in self.cblocks.values():
             newops = []
             subst = {}
@@ -446,14 +755,16 @@ class Function(Object):
         self.spoffsets = offsets
 
     def findlive(self):
-        for block in self.cblocks.values():
-            block.mark_live_roots()
+        flow = Liveness(self)
+        seeds = [(block, block.live_roots()) for block in self.cblocks.values()]
+        flow.run([(block, roots) for block, roots in seeds if roots])
+        self.flowstats['live'] += flow.visits
         for block in self.cblocks.values():
             for reg in list(block.inregs):
-                if not block.livevars[block.inregs[reg]]:
+                if not self.livevars[block.inregs[reg]]:
                     del block.inregs[reg]
         for block in self.cblocks.values():
-            block.ops = [op for op in block.ops if not isinstance(op, DecopAssign) or block.livevars[op.dst]]
+            block.ops = [op for op in block.ops if not isinstance(op, DecopAssign) or self.livevars[op.dst]]
             for out, regs in zip(block.outs, block.outregs):
                 if out is None:
                     if isinstance(block.finalop, DecopRet):
@@ -464,6 +775,10 @@ class Function(Object):
                     for reg in list(regs):
                         if reg not in out.inregs:
                             del regs[reg]
+                        elif isinstance(regs[reg], Var) and not self.livevars[regs[reg]]:
+                            # the live bits are all outside its mask, so
+                            # zero.  Its def may be gone already.
+                            regs[reg] = 0
         self.livecheck = True
 
     def glue_blocks(self):
@@ -541,30 +856,26 @@ class Function(Object):
                     if isinstance(v, InVar):
                         subst[v] = root
             else:
-                # complex case
-                shadow = {}
-                # compute dominance sets
-                for v in rcolor[c]:
-                    queue = []
-                    marked = set()
-                    for root in rcolor[c]:
-                        if not isinstance(root, InVar) and root != v:
-                            queue.append(root)
-                            marked.add(root)
-                    while queue:
-                        svar = queue.pop()
-                        for ssvar in vnext[svar]:
-                            if ssvar not in marked and ssvar != v:
-                                marked.add(ssvar)
-                                queue.append(ssvar)
-                    shadow[v] = rcolor[c] - marked
-                # largest sets first
-                sshadow = sorted(shadow.items(), key=lambda x: len(x[1]), reverse=True)
-                # compute actual substitutions
-                for root, svars in sshadow:
-                    for svar in svars:
-                        if svar != root and svar not in subst:
-                            subst[svar] = root
+                # complex case: dominators of the var flow, from a virtual
+                # root (None) feeding all the roots.  Each var gets the
+                # topmost var that dominates it.
+                roots = [v for v in rcolor[c] if not isinstance(v, InVar)]
+                dom = DomTree(None, lambda v: roots if v is None else vnext[v])
+                top = {}
+                for v in dom.rpo[1:]:
+                    if dom.idom[v] is None:
+                        top[v] = v
+                    else:
+                        top[v] = top[dom.idom[v]]
+                        subst[v] = top[v]
+                unreached = [v for v in rcolor[c] if v not in dom.index]
+                if unreached:
+                    # these are shadowed by everything; the one with the
+                    # largest shadow wins.
+                    sizes = dom.sizes()
+                    best = sorted(rcolor[c], key=lambda v: sizes.get(v, 0), reverse=True)
+                    for svar in unreached:
+                        subst[svar] = best[0] if best[0] is not svar else best[1]
         for block in self.cblocks.values():
             block.substvars(subst)
         self.forward_done = True
@@ -576,7 +887,49 @@ class Function(Object):
                 addr = block.finalop.addr.val
                 if block.end not in self.callees:
                     self.callees[block.end] = addr
-                    self.mark_dirty()
+                    self.mark_dirty(DIRTY_CALLS)
+
+    def propagate_consts(self, sites, swept):
+        if not self.connected or self.error is not None:
+            return
+        # constant on entry if all callers agree on it.  Callers that
+        # haven't been swept (recursion) or failed are unknown, and so is
+        # whatever calls an entry point.  A disagreement is for good.
+        entry = {}
+        if self.deps and all(dep in swept and dep.connected and dep.error is None for dep in self.deps):
+            calls = sites.get(self, [])
+            for call in calls:
+                for reg, val in call.items():
+                    if val is None or entry.get(reg, val) != val:
+                        self.nonconst.add(reg)
+                    entry[reg] = val
+            entry = {reg: val for reg, val in entry.items() if reg not in self.nonconst and all(reg in call for call in calls)}
+        subst = {}
+        for var, reg in self.eblock.localdefs.items():
+            if reg in entry:
+                subst[var] = ExprConst(entry[reg])
+        for block in self.cblocks.values():
+            op = block.finalop
+            if isinstance(op, (DecopNoretCall, DecopRetCall)) and isinstance(op.fsig, Function):
+                consts = {}
+                for reg in op.args:
+                    arg = op.args[reg].fold(subst, FOLD_ALL).mask(op.fsig.args[reg][1])
+                    consts[reg] = arg.val if isinstance(arg, ExprConst) else None
+                sites.setdefault(op.fsig, []).append(consts)
+            if not isinstance(op, (DecopCall, DecopNoretCall, DecopRetCall)) or isinstance(op.addr, ExprConst):
+                continue
+            addr = op.addr.fold(subst, FOLD_ALL).mask(self.isa.codemem.amask)
+            val = addr.val if isinstance(addr, ExprConst) else None
+            if self.constcallees.get(block.end) is not None and self.constcallees[block.end] != val:
+                # a caller turned up that passes something else.  Once
+                # taken back, it stays unresolved.
+                del self.callees[block.end]
+                self.constcallees[block.end] = None
+                self.mark_dirty(DIRTY_CALLS)
+            elif val is not None and block.end not in self.callees and block.end not in self.constcallees:
+                self.callees[block.end] = val
+                self.constcallees[block.end] = val
+                self.mark_dirty(DIRTY_CALLS)
 
     def clean_preserved(self):
         for block in self.cblocks.values():
@@ -589,17 +942,18 @@ class Function(Object):
                 for reg in self.wanted_regs:
                     if reg not in self.retvals:
                         del block.outregs[0][reg]
-        livevars = Counter()
+        marks = []
         for block in self.cblocks.values():
             for op in block.ops:
-                op.findlivemasks(livevars)
-            block.finalop.findlivemasks(livevars)
+                op.findlivemasks(marks)
+            block.finalop.findlivemasks(marks)
+        used = {var for var, _ in marks}
+        for block in self.cblocks.values():
             for regs in block.outregs:
-                for reg in regs:
-                    livevars[regs[reg]] = -1
-        for var in self.eblock.livevars:
-            if var in livevars:
-                self.args[self.eblock.localdefs[var]] = (var, self.eblock.livevars[var])
+                used.update(regs.values())
+        for var, reg in self.eblock.localdefs.items():
+            if var in used and var in self.livevars:
+                self.args[reg] = (var, self.livevars[var])
 
     def structuralize(self):
         stack = []
@@ -610,6 +964,20 @@ class Function(Object):
         depth = {self.eblock: 0, None: -1}
         parent = {}
         joins = []
+
+        def mark_loop(cblock, head):
+            # puts the tree path from cblock up to head into the loop.
+            # Anything already in a loop at least as deep stays there, and
+            # so does the rest of the path up to that loop's header.
+            while cblock != head:
+                if depth[cblock.loop] < depth[head]:
+                    cblock.loop = head
+                    cblock = parent[cblock]
+                elif cblock.loop != cblock:
+                    cblock = cblock.loop
+                else:
+                    cblock = parent[cblock]
+
         while stack:
             block, idx = stack.pop()
             if idx < len(block.outs):
@@ -620,25 +988,18 @@ class Function(Object):
                 elif nblock in done:
                     # a join
                     joins.append((block, nblock))
-                    # .. perhaps within a loop
+                    # .. perhaps within a loop; finished loops are left
+                    # through their headers
                     tl = nblock
                     while tl.loop is not None and tl.loop not in active:
-                        tl = parent[tl]
+                        tl = parent[tl.loop]
                     tl = tl.loop
                     if tl is not None:
-                        cblock = block
-                        while cblock != tl:
-                            if depth[cblock.loop] < depth[tl]:
-                                cblock.loop = tl
-                            cblock = parent[cblock]
+                        mark_loop(block, tl)
                 elif nblock in active:
                     # a loop
                     nblock.loop = nblock
-                    cblock = block
-                    while cblock != nblock:
-                        if depth[cblock.loop] < depth[nblock]:
-                            cblock.loop = nblock
-                        cblock = parent[cblock]
+                    mark_loop(block, nblock)
                 else:
                     depth[nblock] = len(stack)
                     parent[nblock] = block
@@ -648,17 +1009,7 @@ class Function(Object):
                 active.remove(block)
                 done.add(block)
 
-        def lca(a, b):
-            if a is None or b is None:
-                return None
-            while depth[a] > depth[b]:
-                a = parent[a]
-            while depth[b] > depth[a]:
-                b = parent[b]
-            while b != a:
-                b = parent[b]
-                a = parent[a]
-            return a
+        lca = Lifting(self.eblock, parent, depth).lca
 
         for a, b in joins:
             split = lca(a, b)
@@ -748,8 +1099,10 @@ class Function(Object):
                     self.cblocks[addr].print()
         print()
 
-from envy.deco.block import Block, Var, ParmVar, InVar, TempVar
+from envy.deco.block import Block, Var, ParmVar, InVar, TempVar, FOLD_ALL
 from envy.deco.op import Decop, DecopJmp, DecopAssign, DecopCall, DecopRet, DecopNoretCall, DecopRetCall
 from envy.deco.expr.const import ExprConst
 from envy.deco import DecodeError
-from envy.util import lowmask
+from envy.deco.cache import sig_key
+from envy.isa import ISA_CF_NONE, ISA_CF_JMP, ISA_CF_BRA, ISA_CF_CALL
+from envy.util import lowmask, slotstate
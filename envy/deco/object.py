@@ -1,29 +1,67 @@
+DIRTY_CODE = 'code'
+DIRTY_CALLS = 'calls'
+DIRTY_WANTED = 'wanted'
+
+
 class Object:
     def __init__(self, world):
         self.dirty = False
+        self.dirty_reasons = set()
         self.inproc = False
         self.world = world
         self.deps = set()
         self.prevsig = None
+        self.sigver = 0
+        self.seq = len(world.objects)
+        self.nprocessed = 0
+        world.objects.append(self)
 
     def process(self):
         pass
 
+    def propagate_consts(self, sites, swept):
+        pass
+
     def try_process(self):
+        # a run nested in the one that wants us, counted in world.nesting.
         if self.dirty and not self.inproc:
             self.world.dirties.remove(self)
-            self.dirty = False
-            self.inproc = True
+            self.world.nesting += 1
+            try:
+                self.run()
+            finally:
+                self.world.nesting -= 1
+
+    def defer(self):
+        # try_process past max_nesting, World.run runs us after the run
+        # that wants us.
+        if self.dirty and not self.inproc:
+            self.world.defer(self)
+
+    def run(self):
+        self.dirty = False
+        self.inproc = True
+        self.nprocessed += 1
+        try:
             self.process()
+        finally:
             self.inproc = False
 
-    def mark_dirty(self):
+    def mark_dirty(self, reason=DIRTY_CODE):
+        self.dirty_reasons.add(reason)
         if not self.dirty:
             self.dirty = True
             self.world.dirties.add(self)
 
-    def update_sig(self, sig):
+    def update_sig(self, sig, skip=()):
+        # skip: callers that have seen sig already.
         if self.prevsig != sig:
+            self.sigver += 1
             for dep in self.deps:
-                dep.mark_dirty()
+                if dep not in skip and dep.uses_sig(self, self.prevsig, sig):
+                    dep.mark_dirty(DIRTY_CALLS)
         self.prevsig = sig
+
+    def uses_sig(self, obj, old, new):
+        # whether obj's signature going from old to new matters to us.
+        return True
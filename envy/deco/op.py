@@ -2,6 +2,7 @@ from envy.util import bflmask
 
 
 class Decop:
+    __slots__ = ()
     outs = ()
 
     def __repr__(self):
@@ -21,21 +22,29 @@ class Decop:
 
 
 class DecopExit(Decop):
+    __slots__ = ()
+
     def __str__(self):
         return "exit"
 
 
 class DecopRet(Decop):
+    __slots__ = ()
+
     def __str__(self):
         return "return"
 
 
 class DecopIRet(Decop):
+    __slots__ = ()
+
     def __str__(self):
         return "iret"
 
 
 class DecopExec(Decop):
+    __slots__ = ('spec', 'outs', 'ins')
+
     def __init__(self, spec, outs, ins):
         super().__init__()
         self.spec = spec
@@ -65,6 +74,8 @@ class DecopExec(Decop):
 
 
 class DecopLd(Decop):
+    __slots__ = ('space', 'sz', 'dst', 'addr', 'outs')
+
     def __init__(self, space, sz, dst, addr):
         super().__init__()
         self.space = space
@@ -90,6 +101,8 @@ class DecopLd(Decop):
 
 
 class DecopSt(Decop):
+    __slots__ = ('space', 'sz', 'addr', 'src')
+
     def __init__(self, space, sz, addr, src):
         super().__init__()
         self.space = space
@@ -116,6 +129,8 @@ class DecopSt(Decop):
 
 
 class DecopAssign(Decop):
+    __slots__ = ('dst', 'src', 'outs')
+
     def __init__(self, dst, src):
         super().__init__()
         self.dst = dst
@@ -139,6 +154,8 @@ class DecopAssign(Decop):
 
 
 class DecopWrite(Decop):
+    __slots__ = ('dst', 'src')
+
     def __init__(self, dst, src):
         super().__init__()
         self.dst = dst
@@ -161,6 +178,8 @@ class DecopWrite(Decop):
 
 
 class DecopJmp(Decop):
+    __slots__ = ('isa', 'addr')
+
     def __init__(self, isa, addr):
         super().__init__()
         self.isa = isa
@@ -183,6 +202,8 @@ class DecopJmp(Decop):
 
 
 class DecopCall(Decop):
+    __slots__ = ('isa', 'addr')
+
     def __init__(self, isa, addr):
         super().__init__()
         self.isa = isa
@@ -205,6 +226,8 @@ class DecopCall(Decop):
 
 
 class DecopNoretCall(Decop):
+    __slots__ = ('isa', 'addr', 'args', 'fsig')
+
     def __init__(self, isa, addr, fsig, args):
         super().__init__()
         self.isa = isa
@@ -238,6 +261,8 @@ class DecopNoretCall(Decop):
 
 
 class DecopRetCall(Decop):
+    __slots__ = ('isa', 'addr', 'args', 'fsig', 'rets', 'outs')
+
     def __init__(self, isa, addr, fsig, rets, args):
         super().__init__()
         self.isa = isa
@@ -284,6 +309,8 @@ class DecopRetCall(Decop):
 
 
 class DecopBra(Decop):
+    __slots__ = ('isa', 'pred', 'addr')
+
     def __init__(self, isa, pred, addr):
         super().__init__()
         self.isa = isa
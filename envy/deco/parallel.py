@@ -0,0 +1,402 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from envy.deco.pickling import isa_members, Links, pack, unpack, resolver
+from envy.deco.world import World, Domain
+
+# attributes of a Function that stay with the main process.
+LOCAL = {'deps', 'lifted', 'dirty', 'dirty_reasons', 'inproc', 'seq', 'nprocessed', 'sigver', 'constcallees', 'nonconst'}
+
+
+def summary(obj):
+    # dirty ones are stale: a serial run would process them before using
+    # them, or use them and get rerun.
+    return obj.seq, obj.name, obj.start, obj.domain, obj.processed, obj.args, obj.retvals, obj.dirty
+
+
+def summary_key(obj):
+    # what changes when summary(obj) does.
+    return obj.processed, obj.sigver, obj.dirty
+
+
+# worker side
+
+class Blocked(Exception):
+    # a run that met a stale callee the serial run would process first.
+    def __init__(self, stub):
+        self.stub = stub
+
+
+class Job:
+    def __init__(self, inproc, suspended):
+        self.wants = []
+        # the member that ran last.
+        self.last = None
+        # (stub, caller) for every call resolved to a stub.
+        self.used = set()
+        # running in the main process's view, a serial run wouldn't
+        # process these.
+        self.inproc = inproc
+        # ran nested for this run already and gave up, a serial run would
+        # have done that right here.
+        self.suspended = suspended
+        # deferred callees, World.run runs them before anything else.
+        self.deferred = []
+
+
+class FunctionStub:
+    # a callee as seen from a worker: signature only, calls get recorded.
+    def __init__(self, seq, name, start, domain, processed, args, retvals, stale):
+        self.seq = seq
+        self.name = name
+        self.start = start
+        self.domain = domain
+        self.processed = processed
+        self.args = args
+        self.retvals = retvals
+        self.stale = stale
+        # whether it's settled is the main process's business, it reruns
+        # the callers if it isn't.
+        self.dirty = False
+        self.deps = StubDeps(self)
+
+    def is_stale(self):
+        return self.stale and self.seq not in worker['job'].inproc
+
+    def try_process(self):
+        if self.seq in worker['job'].suspended:
+            worker['world'].ndeferred += 1
+        elif self.is_stale():
+            raise Blocked(self)
+
+    def defer(self):
+        if self.is_stale():
+            worker['world'].defer(self)
+
+    def want_reg(self, reg, mask):
+        worker['job'].wants.append((self, reg, mask))
+
+
+class StubDeps:
+    def __init__(self, stub):
+        self.stub = stub
+
+    def add(self, caller):
+        worker['job'].used.add((self.stub, caller))
+
+
+class StubDomain(Domain):
+    def __init__(self, world, isa):
+        super().__init__(world, isa)
+        self.stubs = {}
+
+    def find_function(self, addr):
+        try:
+            self.find_section(self.isa.codemem, addr)
+        except IndexError:
+            return None
+        if addr not in self.stubs:
+            # not known to the main process yet.
+            self.stubs[addr] = FunctionStub(None, 'func_{:x}'.format(addr), addr, self, False, {}, None, True)
+        return self.stubs[addr]
+
+
+class WorkerWorld(World):
+    def defer(self, obj):
+        # neither stubs nor other members run here before this run ends,
+        # the main process runs them right after it like World.run.
+        self.ndeferred += 1
+        worker['job'].deferred.append(obj)
+
+
+worker = {}
+
+
+def worker_init(image, max_nesting):
+    isas, sections, domains = pickle.loads(image)
+    sections = [ImageSection(base, data) for base, data in sections]
+    world = WorkerWorld()
+    world.max_nesting = max_nesting
+    for iidx, layout in domains:
+        isa = isas[iidx]
+        members = isa_members(isa)
+        domain = StubDomain(world, isa)
+        world.domains.append(domain)
+        for midx, sidxs in layout:
+            for sidx in sidxs:
+                domain.add_section(members[midx], sections[sidx])
+    worker['world'] = world
+    worker['links'] = Links(world)
+    worker['sweep'] = None
+
+
+def make_stubs(world, links, data, stubs):
+    for args in unpack(data, links, lambda pid: stubs[pid[1]]):
+        stub = FunctionStub(*args)
+        stub.domain.stubs[stub.start] = stub
+        stubs[stub.seq] = stub
+
+
+def worker_run(sweep, summaries, delta, seqs, data, calls, nesting, inproc, waiting, suspended, once, first):
+    # runs an SCC like World.process_scc, or one member once like
+    # Object.try_process, until something gets deferred.  first runs
+    # first if it's dirty, waiting are World.waiting.  The members are
+    # real Functions here, everything else is a stub: as of the start of
+    # the sweep, or of this job where delta says so.
+    world = worker['world']
+    links = worker['links']
+    if worker['sweep'] != sweep:
+        worker['base'] = {}
+        for domain in world.domains:
+            domain.stubs = {}
+        make_stubs(world, links, summaries, worker['base'])
+        worker['sweep'] = sweep
+    stubs = dict(worker['base'])
+    make_stubs(world, links, delta, stubs)
+    worker['job'] = job = Job(set(inproc), set(suspended))
+    funcs = {seq: Function.__new__(Function) for seq in seqs}
+    states = unpack(data, links, lambda pid: funcs[pid[1]] if pid[1] in funcs else stubs[pid[1]])
+    for seq, state in zip(seqs, states):
+        func = funcs[seq]
+        reasons = state.pop('dirty_reasons')
+        func.__dict__.update(state)
+        func.seq = seq
+        # the main process tells the other callers, see Scheduler.apply.
+        func.deps = set()
+        func.lifted = {}
+        func.dirty = False
+        func.dirty_reasons = set()
+        func.inproc = False
+        func.nprocessed = 0
+        func.sigver = 0
+        func.domain.stubs[func.start] = func
+        for reason in reasons:
+            func.mark_dirty(reason)
+    for callee, caller in calls:
+        funcs[callee].deps.add(funcs[caller])
+    world.nesting = nesting
+    world.waiting = {funcs[seq] if seq in funcs else stubs[seq] for seq in waiting}
+    start = world.ndeferred
+    blocked = None
+    try:
+        while world.ndeferred == start:
+            dirty = [func for func in funcs.values() if func.dirty]
+            if not dirty:
+                break
+            func = funcs[first] if first in funcs and funcs[first].dirty else dirty[0]
+            first = None
+            world.dirties.remove(func)
+            job.last = func
+            func.run()
+            if once:
+                break
+    except Blocked as err:
+        blocked = err.stub
+    finally:
+        world.dirties.clear()
+        world.nesting = 0
+        world.waiting = set()
+        for func in funcs.values():
+            func.section.set_ranges(func, [])
+        for domain in world.domains:
+            domain.stubs = {}
+        for stub in worker['base'].values():
+            stub.domain.stubs[stub.start] = stub
+    if blocked is not None:
+        return pack({'blocked': blocked}, links)
+    res = {
+        'blocked': None,
+        'states': [{key: val for key, val in vars(func).items() if key not in LOCAL} for func in funcs.values()],
+        'runs': [func.nprocessed for func in funcs.values()],
+        'reasons': [func.dirty_reasons for func in funcs.values()],
+        # calls between members, the main process only has the stubs'.
+        'calls': [(callee, caller) for callee in funcs.values() for caller in callee.deps],
+        'used': sorted(job.used, key=lambda pair: (pair[0].seq is None, pair[0].seq, pair[0].start, pair[1].seq)),
+        'wants': job.wants,
+        'deferred': job.deferred,
+        'last': job.last,
+    }
+    return pack(res, links)
+
+
+# main side
+
+class Frame:
+    # an SCC's turn, or a callee run for one: nested like
+    # Object.try_process does it, or deferred like World.run does it.
+    def __init__(self, scc, kind, nesting=0, inproc=frozenset(), waiting=frozenset()):
+        self.scc = scc
+        self.kind = kind
+        self.nesting = nesting
+        self.inproc = inproc
+        # World.waiting as of this run.
+        self.waiting = waiting
+        # callees that ran nested for this run and gave up.
+        self.suspended = set()
+        self.job = None
+        self.reasons = None
+        self.epoch = None
+        # the member World.run would rerun first.
+        self.first = None
+        # what nested runs deferred, World.run runs it after this run.
+        self.pending = []
+        # a deferred run only reruns after what it deferred.
+        self.done = False
+
+
+class Scheduler:
+    # Replays World.process's sweeps: every SCC in callee-first order
+    # takes a turn and runs if it's dirty by then.  A turn only depends on
+    # the callee SCCs' turns, so the dirty SCCs whose callees are done all
+    # run at once; results are applied in sweep order.
+    def __init__(self, world, links, pool):
+        self.world = world
+        self.links = links
+        self.pool = pool
+        self.sweeps = 0
+        # bumped by every apply; sig changes are stamped with it.
+        self.epoch = 0
+        self.changed = {}
+
+    def sweep(self, sccs, callees):
+        world = self.world
+        self.sweeps += 1
+        self.base = [summary_key(obj) for obj in world.objects]
+        self.summaries = pack([summary(obj) for obj in world.objects if isinstance(obj, Function)], self.links)
+        index = {obj: idx for idx, scc in enumerate(sccs) for obj in scc}
+        callers = [set() for _ in sccs]
+        waiting = []
+        for idx, scc in enumerate(sccs):
+            deps = {index[callee] for obj in scc for callee in callees[obj]} - {idx}
+            for dep in deps:
+                callers[dep].add(idx)
+            waiting.append(len(deps))
+        frames = {}
+        ready = [idx for idx in range(len(sccs)) if not waiting[idx]]
+        for head, scc in enumerate(sccs):
+            for idx in ready:
+                frames[idx] = frame = Frame(sccs[idx], 'scc')
+                if any(obj.dirty for obj in frame.scc):
+                    self.dispatch(frame)
+            ready = []
+            self.turn(frames.pop(head))
+            for idx in callers[head]:
+                waiting[idx] -= 1
+                if not waiting[idx]:
+                    ready.append(idx)
+
+    def turn(self, frame):
+        stack = [frame]
+        while stack:
+            frame = stack[-1]
+            if not all(isinstance(obj, Function) for obj in frame.scc):
+                self.world.process_scc(frame.scc)
+                stack.pop()
+                continue
+            if frame.job is None:
+                if frame.done or not any(obj.dirty for obj in frame.scc):
+                    stack.pop()
+                    continue
+                self.dispatch(frame)
+            res = unpack(frame.job.result(), self.links, resolver(self.world, self.links))
+            frame.job = None
+            if res['blocked'] is not None:
+                # what a serial run would process first, nested.
+                self.discard(frame)
+                inproc = frame.inproc | {obj.seq for obj in frame.scc}
+                stack.append(Frame([res['blocked']], 'nested', frame.nesting + 1, inproc, frame.waiting))
+                continue
+            if not self.current(frame, res):
+                self.discard(frame)
+                continue
+            self.apply(frame, res)
+            deferred = frame.pending + res['deferred']
+            frame.pending = []
+            frame.suspended = set()
+            if frame.kind == 'nested':
+                # try_process runs it once, its caller goes on, and gives
+                # up too if it did.
+                stack.pop()
+                stack[-1].pending += deferred
+                if deferred:
+                    stack[-1].suspended.add(frame.scc[0].seq)
+                continue
+            frame.first = res['last']
+            frame.done = frame.kind == 'deferred' and not deferred
+            # World.run runs these next, with the one that gave up waiting.
+            waiting = frame.waiting | {res['last'].seq}
+            for callee in reversed(deferred):
+                stack.append(Frame([callee], 'deferred', waiting=waiting))
+
+    def dispatch(self, frame):
+        world = self.world
+        delta = [summary(obj) for obj in world.objects[len(self.base):] if isinstance(obj, Function)]
+        delta += [summary(world.objects[seq]) for seq, key in enumerate(self.base) if key != summary_key(world.objects[seq])]
+        states = []
+        frame.reasons = []
+        for obj in frame.scc:
+            state = {key: val for key, val in vars(obj).items() if key not in LOCAL}
+            state['dirty_reasons'] = obj.dirty_reasons
+            state['lifted'] = {}
+            states.append(state)
+            frame.reasons.append(obj.dirty_reasons)
+            if obj.dirty:
+                world.dirties.remove(obj)
+                obj.dirty = False
+            obj.dirty_reasons = set()
+        # calls between members, for the members' update_sig.
+        calls = [(callee.seq, caller.seq) for callee in frame.scc for caller in callee.deps if caller in frame.scc]
+        frame.epoch = self.epoch
+        once = frame.kind != 'scc'
+        first = None if frame.first is None else frame.first.seq
+        args = (self.sweeps, self.summaries, pack(delta, self.links), [obj.seq for obj in frame.scc], pack(states, self.links), calls, frame.nesting, sorted(frame.inproc), sorted(frame.waiting), sorted(frame.suspended), once, first)
+        frame.job = self.pool.submit(worker_run, *args)
+
+    def discard(self, frame):
+        # as if it never ran.
+        for obj, reasons in zip(frame.scc, frame.reasons):
+            for reason in reasons:
+                obj.mark_dirty(reason)
+
+    def current(self, frame, res):
+        # whether the run saw what a serial one would have by now: nothing
+        # changed the members or the callees it used since it started.
+        if any(obj.dirty for obj in frame.scc):
+            return False
+        return all(self.changed.get(callee, -1) <= frame.epoch for callee, _ in res['used'])
+
+    def apply(self, frame, res):
+        scc = frame.scc
+        self.epoch += 1
+        for callee, caller in res['used'] + res['calls']:
+            callee.deps.add(caller)
+        sigs = []
+        for func, state, runs in zip(scc, res['states'], res['runs']):
+            sigs.append(state.pop('prevsig'))
+            func.__dict__.update(state)
+            func.nprocessed += runs
+            func.section.set_ranges(func, func.covered_ranges())
+        for callee, reg, mask in res['wants']:
+            callee.want_reg(reg, mask)
+        for func, reasons in zip(scc, res['reasons']):
+            for reason in reasons:
+                func.mark_dirty(reason)
+        for func, sig in zip(scc, sigs):
+            # the members have seen each other's signatures already.
+            sigver = func.sigver
+            func.update_sig(sig, scc)
+            if func.sigver != sigver:
+                self.changed[func] = self.epoch
+
+
+def process_parallel(world, jobs):
+    links = Links(world)
+    with ProcessPoolExecutor(jobs, initializer=worker_init, initargs=(links.image(world), world.max_nesting)) as pool:
+        sched = Scheduler(world, links, pool)
+        while world.dirties:
+            callees = world.callgraph()
+            sched.sweep(world.sccs(callees), callees)
+            if not world.dirties:
+                world.propagate_consts()
+
+from envy.deco.func import Function
+from envy.section import ImageSection
@@ -0,0 +1,119 @@
+import io
+import pickle
+from envy.isa import IsaReg, IsaVisibleReg, IsaSplitReg, IsaSubReg, IsaMem, IsaExec
+
+
+def isa_members(isa):
+    # the isa and every register/space/exec reachable from it, in a stable order.
+    res = [isa]
+    seen = {id(isa)}
+
+    def walk(val):
+        if isinstance(val, (list, tuple)):
+            for sub in val:
+                walk(sub)
+        elif isinstance(val, (IsaReg, IsaVisibleReg, IsaSplitReg, IsaSubReg, IsaMem, IsaExec)):
+            if id(val) in seen:
+                return
+            seen.add(id(val))
+            res.append(val)
+            if isinstance(val, IsaSplitReg):
+                walk(val.fields)
+            elif isinstance(val, IsaSubReg):
+                walk(val.reg)
+
+    for val in vars(isa).values():
+        walk(val)
+    return res
+
+
+class Links:
+    # persistent ids for everything both sides build for themselves.
+    def __init__(self, world):
+        self.ids = {}
+        self.objs = {}
+        self.isas = []
+        self.sections = []
+        self.add(('world',), world)
+        for didx, domain in enumerate(world.domains):
+            self.add(('domain', didx), domain)
+            if domain.isa not in self.isas:
+                self.isas.append(domain.isa)
+            for space in domain.spaces:
+                for section in domain.spaces[space][1]:
+                    if section not in self.sections:
+                        self.sections.append(section)
+        for iidx, isa in enumerate(self.isas):
+            for midx, member in enumerate(isa_members(isa)):
+                self.add(('isa', iidx, midx), member)
+        for sidx, section in enumerate(self.sections):
+            self.add(('section', sidx), section)
+
+    def add(self, pid, obj):
+        self.ids[id(obj)] = pid
+        self.objs[pid] = obj
+
+    def image(self, world):
+        domains = []
+        for domain in world.domains:
+            members = isa_members(domain.isa)
+            layout = []
+            for space, (_, sections) in domain.spaces.items():
+                layout.append((members.index(space), [self.sections.index(section) for section in sections]))
+            domains.append((self.isas.index(domain.isa), layout))
+        sections = [(section.base, bytes(section.data)) for section in self.sections]
+        return pickle.dumps((self.isas, sections, domains))
+
+
+class Packer(pickle.Pickler):
+    def __init__(self, file, links, root, byaddr):
+        super().__init__(file)
+        self.links = links
+        self.root = root
+        self.byaddr = byaddr
+
+    def persistent_id(self, obj):
+        if obj is self.root:
+            return ('self',)
+        if isinstance(obj, (Object, parallel.FunctionStub)):
+            if obj.seq is None or self.byaddr:
+                return ('addr', self.links.ids[id(obj.domain)], obj.start)
+            return ('func', obj.seq)
+        return self.links.ids.get(id(obj))
+
+
+class Unpacker(pickle.Unpickler):
+    def __init__(self, file, links, root, resolve):
+        super().__init__(file)
+        self.links = links
+        self.root = root
+        self.resolve = resolve
+
+    def persistent_load(self, pid):
+        if pid == ('self',):
+            return self.root
+        if pid[0] in ('func', 'addr'):
+            return self.resolve(pid)
+        return self.links.objs[pid]
+
+
+def pack(obj, links, root=None, byaddr=False):
+    # byaddr: refer to other functions by address rather than by seq.
+    f = io.BytesIO()
+    Packer(f, links, root, byaddr).dump(obj)
+    return f.getvalue()
+
+
+def unpack(data, links, resolve, root=None):
+    return Unpacker(io.BytesIO(data), links, root, resolve).load()
+
+
+def resolver(world, links):
+    def resolve(pid):
+        if pid[0] == 'func':
+            return world.objects[pid[1]]
+        return links.objs[pid[1]].find_function(pid[2])
+    return resolve
+
+from envy.deco.object import Object
+from envy.deco import parallel
@@ -1,21 +1,159 @@
+from bisect import bisect_right
+
+# how many callee runs World.process nests by default, far enough from
+# the recursion limit.
+MAX_NESTING = 8
+
+
 class World:
     def __init__(self):
         self.sections = []
         self.domains = []
+        self.objects = []
         self.dirties = set()
+        self.cache = None
+        # how many runs may nest on top of the one being scheduled, by
+        # processing callees as they're found.  None for no limit, which
+        # deep call chains turn into a RecursionError; past it, callees
+        # are left to the scheduler, and a caller that needs one gives up
+        # and reruns once it's done, seeing what a nested run would have.
+        self.max_nesting = MAX_NESTING
+        self.nesting = 0
+        self.deferred = []
+        # callees deferred so far; a run that sees it change gave up.
+        self.ndeferred = 0
+        # callers that gave up, waiting for their deferred callees.  Like
+        # the ones a nested run is in, they're used as they are.
+        self.waiting = set()
 
-    def process(self):
+    def process(self, jobs=None):
+        if jobs is not None:
+            parallel.process_parallel(self, jobs)
+            return
         while self.dirties:
-            obj = self.dirties.pop()
-            obj.dirty = False
-            obj.inproc = True
-            obj.process()
-            obj.inproc = False
+            # callees first; only iterate to a fixpoint within an SCC,
+            # anything dirtied outside of it waits for the next round.
+            for scc in self.sccs(self.callgraph()):
+                self.process_scc(scc)
+            if not self.dirties:
+                self.propagate_consts()
+
+    def may_nest(self):
+        return self.max_nesting is None or self.nesting < self.max_nesting
+
+    def defer(self, obj):
+        self.ndeferred += 1
+        self.deferred.append(obj)
+
+    def process_scc(self, scc):
+        while True:
+            dirty = [obj for obj in scc if obj.dirty]
+            if not dirty:
+                break
+            obj = dirty[0]
+            self.dirties.remove(obj)
+            self.run(obj)
+
+    def run(self, obj):
+        # runs obj, then whatever callees it deferred, depth first on an
+        # explicit stack.  Callers wait below their callees and rerun if
+        # still dirty, which they are when they gave up.
+        obj.run()
+        stack = []
+        while True:
+            if self.deferred:
+                stack.append(obj)
+                self.waiting.add(obj)
+                stack.extend(reversed(self.deferred))
+                self.deferred = []
+            while stack and not stack[-1].dirty:
+                self.waiting.discard(stack.pop())
+            if not stack:
+                break
+            obj = stack.pop()
+            self.waiting.discard(obj)
+            self.dirties.remove(obj)
+            obj.run()
+
+    def propagate_consts(self):
+        # one sweep over the call graph, callers first.  Every object adds
+        # the constant args of its call sites to sites and may resolve
+        # indirect calls from what its own callers passed it (and get
+        # dirtied for that).
+        sites = {}
+        swept = set()
+        for scc in reversed(self.sccs(self.callgraph())):
+            for obj in scc:
+                obj.propagate_consts(sites, swept)
+                swept.add(obj)
+
+    def callgraph(self):
+        callees = {obj: [] for obj in self.objects}
+        for obj in self.objects:
+            for dep in sorted(obj.deps, key=lambda x: x.seq):
+                callees[dep].append(obj)
+        return callees
+
+    def sccs(self, callees):
+        # Tarjan's, iterative.  Emits callee SCCs before their callers.
+        index = {}
+        low = {}
+        stack = []
+        onstack = set()
+        res = []
+        for root in self.objects:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            onstack.add(root)
+            work = [(root, iter(callees[root]))]
+            while work:
+                node, succs = work[-1]
+                for succ in succs:
+                    if succ not in index:
+                        index[succ] = low[succ] = len(index)
+                        stack.append(succ)
+                        onstack.add(succ)
+                        work.append((succ, iter(callees[succ])))
+                        break
+                    elif succ in onstack:
+                        low[node] = min(low[node], index[succ])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        scc = []
+                        while True:
+                            obj = stack.pop()
+                            onstack.remove(obj)
+                            scc.append(obj)
+                            if obj is node:
+                                break
+                        res.append(sorted(scc, key=lambda x: x.seq))
+        return res
 
     def print(self):
         for section in self.sections:
             section.print()
 
+    def print_stats(self):
+        total = 0
+        for obj in self.objects:
+            total += obj.nprocessed
+            print("{}: processed {} times".format(getattr(obj, 'name', obj), obj.nprocessed))
+            for name, visits in sorted(getattr(obj, 'flowstats', {}).items()):
+                print("    {}: {} block visits".format(name, visits))
+        print("total: {} runs over {} objects".format(total, len(self.objects)))
+        if self.cache is not None:
+            print("cache: {} hits, {} misses".format(self.cache.hits, self.cache.misses))
+
+    def print_coverage(self):
+        for section in self.sections:
+            section.print_coverage()
+
 
 class Domain:
     def __init__(self, world, isa):
@@ -25,13 +163,22 @@ class Domain:
 
     def add_section(self, space, section):
         if space not in self.spaces:
-            self.spaces[space] = []
-        self.spaces[space].append(section)
+            self.spaces[space] = ([], [])
+        starts, sections = self.spaces[space]
+        idx = bisect_right(starts, section.base)
+        if idx > 0 and sections[idx - 1].end > section.base:
+            raise ValueError("Section at {:x} overlaps section at {:x}".format(section.base, sections[idx - 1].base))
+        if idx < len(sections) and sections[idx].base < section.end:
+            raise ValueError("Section at {:x} overlaps section at {:x}".format(section.base, sections[idx].base))
+        starts.insert(idx, section.base)
+        sections.insert(idx, section)
 
     def find_section(self, space, addr):
-        for section in self.spaces[space]:
-            if addr in section.range:
-                return section
+        if space in self.spaces:
+            starts, sections = self.spaces[space]
+            idx = bisect_right(starts, addr) - 1
+            if idx >= 0 and addr in sections[idx].range:
+                return sections[idx]
         raise IndexError("No section mapped at {:x}".format(addr))
 
     def lookup(self, space, addr):
@@ -53,3 +200,4 @@ class Domain:
         return obj
 
 from envy.deco.func import Function
+from envy.deco import parallel
@@ -8,6 +8,12 @@ ISA_MEM_RO = 'ro'
 ISA_MEM_RW = 'rw'
 ISA_MEM_IO = 'io'
 
+ISA_CF_NONE = 'none'
+ISA_CF_JMP = 'jmp'
+ISA_CF_BRA = 'bra'
+ISA_CF_CALL = 'call'
+ISA_CF_STOP = 'stop'
+
 
 class IsaMem:
     def __init__(self, name, bsz, amask, mode):
@@ -58,6 +64,9 @@ class IsaSubReg:
         self.start = start
         self.len_ = len_
 
+    def __str__(self):
+        return str(self.reg)
+
 
 class IsaExec:
     def __init__(self, name, omask, imask):
@@ -75,11 +84,13 @@ class IsaSplitReg:
         self.mask = 0
         self.dmask = 0
         self.fields = fields
+        self.regs = set()
         for start, len_, field in fields:
             mask = bflmask(len_) << start
             if isinstance(field, (IsaReg, IsaVisibleReg)):
                 self.dmask |= mask
                 self.mask |= mask
+                self.regs.add(field)
             elif isinstance(field, int):
                 self.mask |= field << start
             else:
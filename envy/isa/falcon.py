@@ -1,11 +1,23 @@
 from envy.util import bflmask, sext
 from envy.isa import Isa, IsaReg, IsaVisibleReg, IsaSplitReg, IsaSubReg, IsaMem, ISA_MEM_RO, ISA_MEM_RW, ISA_MEM_IO, IsaExec
+from envy.isa import ISA_CF_NONE, ISA_CF_JMP, ISA_CF_BRA, ISA_CF_CALL, ISA_CF_STOP
 from envy.deco.expr.const import ExprConst
 from envy.deco.expr.logop import ExprSext
 from envy.deco.expr.cmp import ExprEq, ExprLt
 from envy.deco import DecodeError
 
 
+def once(make):
+    # make(), called the first time the result is wanted only.
+    res = []
+
+    def get():
+        if not res:
+            res.append(make())
+        return res[0]
+    return get
+
+
 class FalconIsa(Isa):
     def __init__(self, version):
         self.r = [IsaReg('r{}'.format(idx), bflmask(32)) for idx in range(16)]
@@ -59,392 +71,606 @@ class FalconIsa(Isa):
             self.codemem = IsaMem('C', 8, bflmask(24), ISA_MEM_RO)
         self.stackptr = self.sp
         self.stackmem = self.data
+        self.optab = self.make_optab()
 
-    def decode(self, name, block, pos):
-        return FalconOp(self, name, block, pos).pos
-
-
-class FalconOp:
-    def __init__(self, isa, name, block, pos):
-        self.isa = isa
-        self.name = name
-        self.block = block
-        self.pos = pos
-        self.origpos = pos
-        op = op0 = self.get_byte()
-        if op < 0xc0:
-            size = op >> 6
-            op = op & 0x3f
-            if op < 0x30:
-                subop = op & 0xf
-                op >>= 4
-                if op == 0 and self.isa.version < 5:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.r[op1 >> 4]
-                    imm = self.get_imm(0, 0)
-                    if subop == 0:
-                        block.emit_st(self.name, self.isa.data, 1 << size, block.get_reg(reg2) + (imm << size), block.get_reg(reg1))
+    def make_optab(self):
+        version = self.version
+        optab = []
+        for op in range(0x100):
+            if 0x40 <= op < 0xc0:
+                # the size bits don't change the decoding.
+                optab.append(optab[op & 0x3f])
+            elif op < 0x40:
+                if op < 0x30:
+                    subop = op & 0xf
+                    op >>= 4
+                    desc = 'sized low {:x}'.format(op)
+                    if op == 0 and version < 5:
+                        optab.append((desc, FalconInsn.form_sized_st, {0: FalconOp.op_st}))
+                    elif op == 0:
+                        optab.append((desc, FalconInsn.form_sized_movi, {subop: FalconOp.op_movi}))
+                    elif op == 1 or version < 5:
+                        handlers = {}
+                        for s in [0, 1, 2, 3]:
+                            handlers[s] = FalconOp.op_add_rri
+                        if op == 1:
+                            for s in [4, 5, 7, 0xc, 0xd]:
+                                handlers[s] = FalconOp.op_shift_rri
+                            handlers[8] = FalconOp.op_ld
+                        optab.append((desc, FalconInsn.form_sized_rri, handlers))
                     else:
-                        raise DecodeError('sized low {:x}/{:x}'.format(op, subop))
-                elif op == 0 and self.isa.version >= 5:
-                    reg0 = isa.r[subop]
-                    imm = self.get_fimm(size + 1)
-                    block.set_reg(reg0, ExprConst(imm), self.name)
-                elif op == 1 or (op == 2 and self.isa.version < 5):
-                    op1 = self.get_byte()
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    imm = self.get_imm(op == 2, 0)
-                    if subop in [0, 1, 2, 3]:
-                        self.emit_add(size, reg1, block.get_reg(reg2), ExprConst(imm), subop)
-                    elif subop in [4, 5, 7, 0xc, 0xd] and op == 1:
-                        self.emit_shift(size, reg1, block.get_reg(reg2), ExprConst(imm), subop)
-                    elif subop == 8 and op == 1:
-                        reg2 = self.isa.r[op1 >> 4]
-                        res = block.emit_ld(self.name, self.isa.data, 1 << size, block.get_reg(reg2) + (imm << size))
-                        block.set_reg(reg1, res, self.name)
-                    else:
-                        raise DecodeError('sized low {:x}/{:x}'.format(op, subop))
-                elif op == 2 and self.isa.version >= 5:
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    # XXX st, st[sp], cmpu, cmps, cmp
-                    raise DecodeError('sized low {:x}/{:x}'.format(op, subop))
-                else:
-                    raise DecodeError('sized low {:x}/{:x}'.format(op, subop))
-            else:
+                        # XXX st, st[sp], cmpu, cmps, cmp
+                        optab.append(('{}/{:x}'.format(desc, subop), None, None))
+                    continue
+                desc = 'sized high {:x}'.format(op)
                 if op in [0x30, 0x31]:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    imm = self.get_imm(op & 1, 0)
-                    if subop == 1:
-                        block.emit_st(self.name, self.isa.data, 1 << size, block.get_reg(self.isa.sp) + (imm << size), block.get_reg(reg2))
-                    elif subop == 6 and self.isa.version >= 3:
-                        self.emit_add(size, None, block.get_reg(reg2), ExprConst(imm), 2)
-                    else:
-                        # XXX st, cmpu, cmps
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    # XXX st, cmpu, cmps
+                    handlers = {1: FalconOp.op_stsp}
+                    if version >= 3:
+                        handlers[6] = FalconOp.op_cmp_ri
+                    optab.append((desc, FalconInsn.form_sized_ri, handlers))
                 elif op == 0x34:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    imm = self.get_imm(0, 0)
-                    if subop == 0:
-                        res = block.emit_ld(self.name, self.isa.data, 1 << size, block.get_reg(self.isa.sp) + (imm << size))
-                        block.set_reg(reg2, res, self.name)
-                    else:
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    optab.append((desc, FalconInsn.form_sized_ri, {0: FalconOp.op_ldsp}))
                 elif op in [0x36, 0x37]:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    imm = self.get_imm(op & 1, 0)
-                    if subop in [0, 1, 2, 3]:
-                        self.emit_add(size, reg2, self.block.get_reg(reg2), ExprConst(imm), subop)
-                    elif subop in [4, 5, 7, 0xc, 0xd] and op == 0x36:
-                        self.emit_shift(size, reg2, self.block.get_reg(reg2), ExprConst(imm), subop)
-                    else:
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
-                elif op == 0x38 and self.isa.version < 5:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    if subop == 6 and self.isa.version >= 3:
-                        self.emit_add(size, None, block.get_reg(reg2), block.get_reg(reg1), 2)
-                    else:
-                        # XXX st, st[sp], cmpu, cmps
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    handlers = {}
+                    for s in [0, 1, 2, 3]:
+                        handlers[s] = FalconOp.op_add_ri
+                    if op == 0x36:
+                        for s in [4, 5, 7, 0xc, 0xd]:
+                            handlers[s] = FalconOp.op_shift_ri
+                    optab.append((desc, FalconInsn.form_sized_ri, handlers))
+                elif op == 0x38 and version < 5:
+                    # XXX st, st[sp], cmpu, cmps
+                    handlers = {}
+                    if version >= 3:
+                        handlers[6] = FalconOp.op_cmp_rr
+                    optab.append((desc, FalconInsn.form_sized_rr, handlers))
                 elif op == 0x39:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    if subop == 0:
-                        self.emit_not(size, reg1, block.get_reg(reg2))
-                    else:
-                        # XXX neg, mov/movf, hwswap
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    # XXX neg, mov/movf, hwswap
+                    optab.append((desc, FalconInsn.form_sized_rr, {0: FalconOp.op_not}))
                 elif op == 0x3b:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    if subop in [0, 1, 2, 3]:
-                        self.emit_add(size, reg2, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    elif subop in [4, 5, 7, 0xc, 0xd]:
-                        self.emit_shift(size, reg2, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    else:
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    handlers = {}
+                    for s in [0, 1, 2, 3]:
+                        handlers[s] = FalconOp.op_add_rr
+                    for s in [4, 5, 7, 0xc, 0xd]:
+                        handlers[s] = FalconOp.op_shift_rr
+                    optab.append((desc, FalconInsn.form_sized_rr, handlers))
                 elif op == 0x3c:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.rs[size][op1 & 0xf]
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    reg3 = self.isa.rs[size][op2 >> 4]
-                    if subop in [0, 1, 2, 3]:
-                        self.emit_add(size, reg3, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    elif subop in [4, 5, 7, 0xc, 0xd]:
-                        self.emit_shift(size, reg3, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    else:
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    handlers = {}
+                    for s in [0, 1, 2, 3]:
+                        handlers[s] = FalconOp.op_add_rrr
+                    for s in [4, 5, 7, 0xc, 0xd]:
+                        handlers[s] = FalconOp.op_shift_rrr
+                    optab.append((desc, FalconInsn.form_sized_rrr, handlers))
                 elif op == 0x3d:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    reg2 = self.isa.rs[size][op1 >> 4]
-                    if subop == 4:
-                        block.set_reg(reg2, ExprConst(0), self.name)
-                    else:
-                        # XXX not, neg, mov/movf, hswap, setf
-                        raise DecodeError('sized high {:x}/{:x}'.format(op, subop))
+                    # XXX not, neg, mov/movf, hswap, setf
+                    optab.append((desc, FalconInsn.form_sized_r, {4: FalconOp.op_clear}))
                 else:
                     # XXX 32, 33, 35, 38[v5], 3a, 3e, 3f
-                    raise DecodeError('sized high {:x}'.format(op))
-        else:
-            if op < 0xf0:
+                    optab.append((desc, None, None))
+            elif op < 0xf0:
                 subop = op & 0xf
                 op >>= 4
+                desc = 'unsized low {:x}'.format(op)
                 if op in [0xc, 0xe]:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.r[op1 & 0xf]
-                    reg2 = self.isa.r[op1 >> 4]
-                    imm = self.get_imm(op == 0xe, subop == 1)
-                    if subop in [3, 7] and self.isa.version >= 3:
-                        self.emit_extr(reg1, block.get_reg(reg2), imm, subop)
-                    elif subop in [4, 5, 6]:
-                        self.emit_logop(reg1, block.get_reg(reg2), imm, subop)
-                    elif subop == 0xf:
-                        self.emit_iord(reg1, block.get_reg(reg2) + imm * 4)
-                    else:
-                        # XXX other
-                        raise DecodeError('unsized low {:x}/{:x}'.format(op, subop))
-                elif op == 0xd and self.isa.version < 5:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.r[op1 & 0xf]
-                    reg2 = self.isa.r[op1 >> 4]
-                    imm = self.get_imm(0, 0)
-                    block.emit_exec(self.name, self.isa.iowr, [block.get_reg(reg2) + imm * 4, block.get_reg(reg1)])
+                    # XXX other
+                    handlers = {}
+                    if version >= 3:
+                        handlers[3] = FalconOp.op_extr_rri
+                        handlers[7] = FalconOp.op_extr_rri
+                    for s in [4, 5, 6]:
+                        handlers[s] = FalconOp.op_logop_rri
+                    handlers[0xf] = FalconOp.op_iord_rri
+                    optab.append((desc, FalconInsn.form_rri, handlers))
+                elif op == 0xd and version < 5:
+                    optab.append((desc, FalconInsn.form_rri_u8, {subop: FalconOp.op_iowr_rri}))
                 else:
                     # XXX 0xd[old], 0xd[v5]
-                    raise DecodeError('unsized low {:x}/{:x}'.format(op, subop))
+                    optab.append(('{}/{:x}'.format(desc, subop), None, None))
             else:
+                desc = 'unsized high {:x}'.format(op)
                 if op in [0xf0, 0xf1]:
-                    op1 = self.get_byte()
-                    reg2 = self.isa.r[op1 >> 4]
-                    subop = op1 & 0xf
-                    imm = self.get_imm(op & 1, subop in [1, 7])
-                    if subop == 0:
-                        block.set_reg(reg2, isa.mulu(block.get_reg(reg2), imm), self.name)
-                    elif subop == 1:
-                        block.set_reg(reg2, isa.muls(block.get_reg(reg2), imm), self.name)
-                    #elif subop == 2 and op == 0xf0:
-                    #    block.set_reg(reg2, ExprSext(block.get_reg(reg2), imm & 0x1f), self.name)
-                    elif subop == 3:
-                        block.set_reg(reg2, block.get_reg(reg2) & 0xffff | imm << 16, self.name)
-                    elif subop in [4, 5, 6]:
-                        self.emit_logop(reg2, block.get_reg(reg2), imm, subop)
-                    elif subop == 7:
-                        block.set_reg(reg2, ExprConst(imm), self.name)
-                    elif subop == 0xc and op == 0xf0:
-                        self.emit_xbit(reg2, block.get_reg(self.isa.flags), imm)
-                    else:
-                        # XXX 2, 9-11
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX 2, 9-11
+                    handlers = {
+                        0: FalconOp.op_mulu_ri,
+                        1: FalconOp.op_muls_ri,
+                        3: FalconOp.op_sethi,
+                        4: FalconOp.op_logop_ri,
+                        5: FalconOp.op_logop_ri,
+                        6: FalconOp.op_logop_ri,
+                        7: FalconOp.op_movi,
+                    }
+                    if op == 0xf0:
+                        handlers[0xc] = FalconOp.op_xbit_ri
+                    optab.append((desc, FalconInsn.form_ri, handlers))
                 elif op in [0xf4, 0xf5]:
-                    op1 = self.get_byte()
-                    subop = op1 & 0x3f
-                    imm = self.get_imm(op & 1, subop < 0x20 or subop == 0x30)
-                    if subop < 0x20:
-                        target = ExprConst(imm + self.origpos)
-                        if subop == 0xe:
-                            block.emit_jmp(self.name, target)
-                        else:
-                            if subop in range(0x00, 0x0c):
-                                pred = block.get_reg(self.isa.flags.fields[subop][2])
-                            elif subop in range(0x0c, 0x0e):
-                                pred = block.get_reg(self.isa.cf) | block.get_reg(self.isa.zf)
-                                if subop == 0xc:
-                                    pred = pred ^ 1
-                            elif subop in range(0x10, 0x1c):
-                                pred = block.get_reg(self.isa.flags.fields[subop - 0x10][2]) ^ 1
-                            elif subop in range(0x1c, 0x20):
-                                pred = block.get_reg(self.isa.sf) ^ block.get_reg(self.isa.of)
-                                if subop in [0x1c, 0x1d]:
-                                    pred |= block.get_reg(self.isa.zf)
-                                if subop in [0x1c, 0x1f]:
-                                    pred ^= 1
-                            else:
-                                raise DecodeError('bra pred {}'.format(subop))
-                            block.emit_bra(self.name, pred, target)
-                    elif subop == 0x20:
-                        block.emit_jmp(self.name, ExprConst(imm))
-                    elif subop == 0x21:
-                        block.emit_call(self.name, ExprConst(imm))
-                    elif subop == 0x28 and op == 0xf4:
-                        block.emit_exec(self.name, self.isa.sleep, [block.get_reg(self.isa.flags) >> (imm & 0x1f)])
-                    elif subop == 0x30:
-                        block.set_reg(isa.sp, block.get_reg(isa.sp) + imm, self.name)
-                    elif subop == 0x31 and op == 0xf4:
-                        block.set_reg(isa.flags, block.get_reg(isa.flags) | 1 << imm, self.name)
-                    elif subop == 0x32 and op == 0xf4:
-                        block.set_reg(isa.flags, block.get_reg(isa.flags) & ~(1 << imm), self.name)
-                    elif subop == 0x33 and op == 0xf4:
-                        block.set_reg(isa.flags, block.get_reg(isa.flags) ^ 1 << imm, self.name)
-                    else:
-                        # XXX 3c
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX 3c
+                    handlers = {}
+                    for s in range(0x20):
+                        handlers[s] = FalconOp.op_bra
+                    handlers[0xe] = FalconOp.op_jmp_rel
+                    handlers[0x20] = FalconOp.op_jmp
+                    handlers[0x21] = FalconOp.op_call
+                    handlers[0x30] = FalconOp.op_addsp
+                    if op == 0xf4:
+                        handlers[0x28] = FalconOp.op_sleep
+                        handlers[0x31] = FalconOp.op_bset_flags
+                        handlers[0x32] = FalconOp.op_bclr_flags
+                        handlers[0x33] = FalconOp.op_btgl_flags
+                    optab.append((desc, FalconInsn.form_i, handlers))
                 elif op == 0xf8:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    if subop == 0:
-                        block.emit_ret()
-                    elif subop == 1:
-                        block.emit_iret()
-                    elif subop == 2:
-                        block.emit_exit()
-                    elif subop == 3:
-                        block.emit_exec(self.name, self.isa.xdwait, [])
-                    elif subop == 7:
-                        block.emit_exec(self.name, self.isa.xcwait, [])
-                    else:
-                        # XXX iret, f8/6, trap
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX iret, f8/6, trap
+                    handlers = {
+                        0: FalconOp.op_ret,
+                        1: FalconOp.op_iret,
+                        2: FalconOp.op_exit,
+                        3: FalconOp.op_xdwait,
+                        7: FalconOp.op_xcwait,
+                    }
+                    optab.append((desc, FalconInsn.form_n, handlers))
                 elif op == 0xf9:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    reg2 = isa.r[op1 >> 4]
-                    if subop == 0:
-                        block.set_reg(isa.sp, block.get_reg(isa.sp) - 4, self.name)
-                        block.emit_st(self.name, self.isa.data, 4, block.get_reg(isa.sp), block.get_reg(reg2))
-                    elif subop == 5:
-                        block.emit_call(self.name, block.get_reg(reg2))
-                    else:
-                        # XXX add[sp], mpush, bra, itlb, bset, bclr, btgl
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX add[sp], mpush, bra, itlb, bset, bclr, btgl
+                    optab.append((desc, FalconInsn.form_r, {0: FalconOp.op_push, 5: FalconOp.op_call_r}))
                 elif op == 0xfa:
-                    op1 = self.get_byte()
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    reg1 = isa.r[op1 & 0xf]
-                    reg2 = isa.r[op1 >> 4]
-                    if subop == 0:
-                        block.emit_exec(self.name, self.isa.iowr, [block.get_reg(reg2), block.get_reg(reg1)])
-                    elif subop == 1:
-                        block.emit_exec(self.name, self.isa.iowrs, [block.get_reg(reg2), block.get_reg(reg1)])
-                    elif subop in [4, 5, 6]:
-                        if subop == 4:
-                            pshift = 0
-                            spec = self.isa.xcld
-                            base = self.isa.xcbase
-                        elif subop == 5:
-                            pshift = 8
-                            spec = self.isa.xdld
-                            base = self.isa.xdbase
-                        elif subop == 6:
-                            pshift = 12
-                            spec = self.isa.xdst
-                            base = self.isa.xdbase
-                        port = block.get_reg(self.isa.xtargets) >> pshift
-                        base = block.get_reg(base)
-                        offs = block.get_reg(reg2)
-                        p2 = block.get_reg(reg1)
-                        addr = p2 & 0xffff
-                        size = p2 >> 16
-                        block.emit_exec(self.name, spec, [port, base, offs, addr, size])
-                    else:
-                        # XXX xcld, xdld. xdst, setp
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX xcld, xdld. xdst, setp
+                    handlers = {
+                        0: FalconOp.op_iowr_rr,
+                        1: FalconOp.op_iowrs_rr,
+                        4: FalconOp.op_xfer,
+                        5: FalconOp.op_xfer,
+                        6: FalconOp.op_xfer,
+                    }
+                    optab.append((desc, FalconInsn.form_rr, handlers))
                 elif op == 0xfc:
-                    op1 = self.get_byte()
-                    subop = op1 & 0xf
-                    reg2 = isa.r[op1 >> 4]
-                    if subop == 0:
-                        tmp = block.emit_ld(self.name, self.isa.data, 4, block.get_reg(isa.sp))
-                        block.set_reg(isa.sp, block.get_reg(isa.sp) + 4, self.name + '_sp')
-                        block.set_reg(reg2, tmp, self.name)
-                    else:
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    optab.append((desc, FalconInsn.form_r, {0: FalconOp.op_pop}))
                 elif op == 0xfd:
-                    op1 = self.get_byte()
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    reg1 = isa.r[op1 & 0xf]
-                    reg2 = isa.r[op1 >> 4]
-                    if subop in [0, 1]:
-                        self.emit_mul(reg2, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    elif subop in [4, 5, 6]:
-                        self.emit_logop(reg2, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    else:
-                        # XXX sext, bit*
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX sext, bit*
+                    handlers = {
+                        0: FalconOp.op_mul_rr,
+                        1: FalconOp.op_mul_rr,
+                        4: FalconOp.op_logop_rr,
+                        5: FalconOp.op_logop_rr,
+                        6: FalconOp.op_logop_rr,
+                    }
+                    optab.append((desc, FalconInsn.form_rr, handlers))
                 elif op == 0xfe:
-                    op1 = self.get_byte()
-                    op2 = self.get_byte()
-                    reg1 = self.isa.r[op1 & 0xf]
-                    reg2 = self.isa.r[op1 >> 4]
-                    subop = op2 & 0xf
-                    if subop == 0:
-                        sr = isa.sr[op1 & 0xf]
-                        if sr is None:
-                            raise DecodeError('mov to $sr{}'.format(op1 & 0xf))
-                        block.set_reg(sr, block.get_reg(reg2), self.name)
-                    elif subop == 1:
-                        sr = isa.sr[op1 >> 4]
-                        if sr is None:
-                            raise DecodeError('mov from $sr{}'.format(op1 >> 4))
-                        block.set_reg(reg1, block.get_reg(sr), self.name)
-                    else:
-                        # XXX ptlb, vtlb, xbit
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX ptlb, vtlb, xbit
+                    optab.append((desc, FalconInsn.form_movsr, {0: FalconOp.op_movsr_to, 1: FalconOp.op_movsr_from}))
                 elif op == 0xff:
-                    op1 = self.get_byte()
-                    reg1 = self.isa.r[op1 & 0xf]
-                    reg2 = self.isa.r[op1 >> 4]
-                    op2 = self.get_byte()
-                    subop = op2 & 0xf
-                    reg3 = self.isa.r[op2 >> 4]
-                    if subop in [0, 1]:
-                        self.emit_mul(reg3, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    elif subop in [4, 5, 6]:
-                        self.emit_logop(reg3, block.get_reg(reg2), block.get_reg(reg1), subop)
-                    elif subop == 0xf:
-                        self.emit_iord(reg3, block.get_reg(reg2) + block.get_reg(reg1) * 4)
-                    else:
-                        # XXX sext, extr*, xbit, div/mod, 0xe
-                        raise DecodeError('unsized high {:x}/{:x}'.format(op, subop))
+                    # XXX sext, extr*, xbit, div/mod, 0xe
+                    handlers = {
+                        0: FalconOp.op_mul_rrr,
+                        1: FalconOp.op_mul_rrr,
+                        4: FalconOp.op_logop_rrr,
+                        5: FalconOp.op_logop_rrr,
+                        6: FalconOp.op_logop_rrr,
+                        0xf: FalconOp.op_iord_rrr,
+                    }
+                    optab.append((desc, FalconInsn.form_rrr, handlers))
                 else:
                     # XXX f2, f6, f7, fb
-                    raise DecodeError('unsized high {:x}'.format(op))
+                    optab.append((desc, None, None))
+        # most opcodes decode the same as a few others, keep one copy of
+        # each entry.
+        shared = {}
+        for op, (desc, form, handlers) in enumerate(optab):
+            key = desc, form, None if handlers is None else tuple(sorted(handlers.items()))
+            optab[op] = shared.setdefault(key, optab[op])
+        return optab
+
+    def decode_insn(self, section, pos):
+        return FalconInsn(self, section, pos)
+
+    def decode(self, name, block, pos):
+        insn = block.section.decode(self, pos)
+        FalconOp(self, name, block, insn)
+        return insn.end
+
+
+class FalconInsn:
+    __slots__ = ('isa', 'section', 'pos', 'end', 'op', 'op1', 'op2', 'reg1', 'reg2', 'reg3', 'imm', 'sr', 'size', 'subop', 'handler', 'cf', 'target')
+
+    def __init__(self, isa, section, pos):
+        self.isa = isa
+        self.section = section
+        self.pos = pos
+        self.end = pos
+        self.op1 = self.op2 = None
+        self.reg1 = self.reg2 = self.reg3 = None
+        self.imm = None
+        self.sr = None
+        self.op = self.get_byte()
+        self.size = self.op >> 6
+        desc, form, handlers = isa.optab[self.op]
+        if form is None:
+            raise DecodeError(desc)
+        self.subop = form(self)
+        self.handler = handlers.get(self.subop)
+        if self.handler is None:
+            raise DecodeError('{}/{:x}'.format(desc, self.subop))
+        self.cf = FalconOp.cfclass.get(self.handler, ISA_CF_NONE)
+        if self.handler in (FalconOp.op_bra, FalconOp.op_jmp_rel):
+            self.target = self.imm + self.pos
+        elif self.handler in (FalconOp.op_jmp, FalconOp.op_call):
+            self.target = self.imm
+        else:
+            self.target = None
+
+    def __str__(self):
+        name, fmt = FalconOp.syntax[self.handler]
+        if isinstance(name, dict):
+            name = name[self.subop]
+        args = {
+            'sz': 'b{}'.format(8 << self.size),
+            'r1': self.reg1,
+            'r2': self.reg2,
+            'r3': self.reg3,
+            'imm': self.imm,
+            'sr': self.sr,
+            'target': self.target,
+            'pred': PRED_NAMES.get(self.subop),
+        }
+        if self.imm is not None:
+            args['off'] = self.imm << self.size
+            args['ioff'] = self.imm * 4
+        return (name + ' ' + fmt.format(**args)).rstrip()
+
+    # operand forms: fetch the remaining bytes, return the subop
+
+    def form_sized_st(self):
+        self.op1 = self.get_byte()
+        self.reg1 = self.isa.rs[self.size][self.op1 & 0xf]
+        self.reg2 = self.isa.r[self.op1 >> 4]
+        self.imm = self.get_imm(0, 0)
+        return self.op & 0xf
+
+    def form_sized_movi(self):
+        self.reg2 = self.isa.r[self.op & 0xf]
+        self.imm = self.get_fimm(self.size + 1)
+        return self.op & 0xf
+
+    def form_sized_rri(self):
+        self.op1 = self.get_byte()
+        self.reg1 = self.isa.rs[self.size][self.op1 & 0xf]
+        self.reg2 = self.isa.rs[self.size][self.op1 >> 4]
+        self.imm = self.get_imm(self.op >> 5 & 1, 0)
+        return self.op & 0xf
+
+    def form_sized_ri(self):
+        self.op1 = self.get_byte()
+        self.reg2 = self.isa.rs[self.size][self.op1 >> 4]
+        self.imm = self.get_imm(self.op & 1, 0)
+        return self.op1 & 0xf
+
+    def form_sized_rr(self):
+        self.op1 = self.get_byte()
+        self.reg1 = self.isa.rs[self.size][self.op1 & 0xf]
+        self.reg2 = self.isa.rs[self.size][self.op1 >> 4]
+        self.op2 = self.get_byte()
+        return self.op2 & 0xf
+
+    def form_sized_rrr(self):
+        subop = self.form_sized_rr()
+        self.reg3 = self.isa.rs[self.size][self.op2 >> 4]
+        return subop
+
+    def form_sized_r(self):
+        self.op1 = self.get_byte()
+        self.reg2 = self.isa.rs[self.size][self.op1 >> 4]
+        return self.op1 & 0xf
+
+    def form_rri(self):
+        self.op1 = self.get_byte()
+        self.reg1 = self.isa.r[self.op1 & 0xf]
+        self.reg2 = self.isa.r[self.op1 >> 4]
+        self.imm = self.get_imm(self.op >> 5 & 1, self.op & 0xf == 1)
+        return self.op & 0xf
+
+    def form_rri_u8(self):
+        self.op1 = self.get_byte()
+        self.reg1 = self.isa.r[self.op1 & 0xf]
+        self.reg2 = self.isa.r[self.op1 >> 4]
+        self.imm = self.get_imm(0, 0)
+        return self.op & 0xf
+
+    def form_ri(self):
+        self.op1 = self.get_byte()
+        self.reg2 = self.isa.r[self.op1 >> 4]
+        subop = self.op1 & 0xf
+        self.imm = self.get_imm(self.op & 1, subop in [1, 7])
+        return subop
+
+    def form_i(self):
+        self.op1 = self.get_byte()
+        subop = self.op1 & 0x3f
+        self.imm = self.get_imm(self.op & 1, subop < 0x20 or subop == 0x30)
+        if subop == 0xf:
+            raise DecodeError('bra pred {}'.format(subop))
+        return subop
+
+    def form_n(self):
+        self.op1 = self.get_byte()
+        return self.op1 & 0xf
+
+    def form_r(self):
+        self.op1 = self.get_byte()
+        self.reg2 = self.isa.r[self.op1 >> 4]
+        return self.op1 & 0xf
+
+    def form_rr(self):
+        self.op1 = self.get_byte()
+        self.op2 = self.get_byte()
+        self.reg1 = self.isa.r[self.op1 & 0xf]
+        self.reg2 = self.isa.r[self.op1 >> 4]
+        return self.op2 & 0xf
+
+    def form_rrr(self):
+        subop = self.form_rr()
+        self.reg3 = self.isa.r[self.op2 >> 4]
+        return subop
+
+    def form_movsr(self):
+        subop = self.form_rr()
+        if subop == 0:
+            self.sr = self.isa.sr[self.op1 & 0xf]
+            if self.sr is None:
+                raise DecodeError('mov to $sr{}'.format(self.op1 & 0xf))
+        elif subop == 1:
+            self.sr = self.isa.sr[self.op1 >> 4]
+            if self.sr is None:
+                raise DecodeError('mov from $sr{}'.format(self.op1 >> 4))
+        return subop
 
     def get_byte(self):
-        res = self.block.section.get(self.pos, 1)
-        self.pos += 1
+        res = self.section.get(self.end, 1)
+        self.end += 1
         return res
 
     def get_imm(self, sz, sign):
         if sz == 0:
-            res = self.block.section.get(self.pos, 1)
-            self.pos += 1
+            res = self.section.get(self.end, 1)
+            self.end += 1
             if sign:
                 res = sext(res, 7)
         else:
-            res = self.block.section.get(self.pos, 2)
-            self.pos += 2
+            res = self.section.get(self.end, 2)
+            self.end += 2
             if sign:
                 res = sext(res, 15)
         return res
 
     def get_fimm(self, bnum):
-        res = self.block.section.get(self, pos, bnum)
-        self.pos += bnum
+        res = self.section.get(self.end, bnum)
+        self.end += bnum
         return res
 
+
+class FalconOp:
+    def __init__(self, isa, name, block, insn):
+        self.isa = isa
+        self.name = name
+        self.block = block
+        self.insn = insn
+        self.origpos = insn.pos
+        insn.handler(self)
+
+    # instruction handlers
+
+    def op_st(self):
+        block = self.block
+        block.emit_st(self.name, self.isa.data, 1 << self.insn.size, block.get_reg(self.insn.reg2) + (self.insn.imm << self.insn.size), block.get_reg(self.insn.reg1))
+
+    def op_stsp(self):
+        block = self.block
+        block.emit_st(self.name, self.isa.data, 1 << self.insn.size, block.get_reg(self.isa.sp) + (self.insn.imm << self.insn.size), block.get_reg(self.insn.reg2))
+
+    def op_ld(self):
+        block = self.block
+        reg2 = self.isa.r[self.insn.op1 >> 4]
+        res = block.emit_ld(self.name, self.isa.data, 1 << self.insn.size, block.get_reg(reg2) + (self.insn.imm << self.insn.size))
+        block.set_reg(self.insn.reg1, res, self.name)
+
+    def op_ldsp(self):
+        block = self.block
+        res = block.emit_ld(self.name, self.isa.data, 1 << self.insn.size, block.get_reg(self.isa.sp) + (self.insn.imm << self.insn.size))
+        block.set_reg(self.insn.reg2, res, self.name)
+
+    def op_movi(self):
+        self.block.set_reg(self.insn.reg2, ExprConst(self.insn.imm), self.name)
+
+    def op_clear(self):
+        self.block.set_reg(self.insn.reg2, ExprConst(0), self.name)
+
+    def op_add_rri(self):
+        self.emit_add(self.insn.size, self.insn.reg1, self.block.get_reg(self.insn.reg2), ExprConst(self.insn.imm), self.insn.subop)
+
+    def op_shift_rri(self):
+        self.emit_shift(self.insn.size, self.insn.reg1, self.block.get_reg(self.insn.reg2), ExprConst(self.insn.imm), self.insn.subop)
+
+    def op_add_ri(self):
+        self.emit_add(self.insn.size, self.insn.reg2, self.block.get_reg(self.insn.reg2), ExprConst(self.insn.imm), self.insn.subop)
+
+    def op_shift_ri(self):
+        self.emit_shift(self.insn.size, self.insn.reg2, self.block.get_reg(self.insn.reg2), ExprConst(self.insn.imm), self.insn.subop)
+
+    def op_cmp_ri(self):
+        self.emit_add(self.insn.size, None, self.block.get_reg(self.insn.reg2), ExprConst(self.insn.imm), 2)
+
+    def op_add_rr(self):
+        self.emit_add(self.insn.size, self.insn.reg2, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_shift_rr(self):
+        self.emit_shift(self.insn.size, self.insn.reg2, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_cmp_rr(self):
+        self.emit_add(self.insn.size, None, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), 2)
+
+    def op_add_rrr(self):
+        self.emit_add(self.insn.size, self.insn.reg3, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_shift_rrr(self):
+        self.emit_shift(self.insn.size, self.insn.reg3, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_not(self):
+        self.emit_not(self.insn.size, self.insn.reg1, self.block.get_reg(self.insn.reg2))
+
+    def op_extr_rri(self):
+        self.emit_extr(self.insn.reg1, self.block.get_reg(self.insn.reg2), self.insn.imm, self.insn.subop)
+
+    def op_logop_rri(self):
+        self.emit_logop(self.insn.reg1, self.block.get_reg(self.insn.reg2), self.insn.imm, self.insn.subop)
+
+    def op_iord_rri(self):
+        self.emit_iord(self.insn.reg1, self.block.get_reg(self.insn.reg2) + self.insn.imm * 4)
+
+    def op_iowr_rri(self):
+        block = self.block
+        block.emit_exec(self.name, self.isa.iowr, [block.get_reg(self.insn.reg2) + self.insn.imm * 4, block.get_reg(self.insn.reg1)])
+
+    def op_mulu_ri(self):
+        self.block.set_reg(self.insn.reg2, self.isa.mulu(self.block.get_reg(self.insn.reg2), self.insn.imm), self.name)
+
+    def op_muls_ri(self):
+        self.block.set_reg(self.insn.reg2, self.isa.muls(self.block.get_reg(self.insn.reg2), self.insn.imm), self.name)
+
+    def op_sethi(self):
+        self.block.set_reg(self.insn.reg2, self.block.get_reg(self.insn.reg2) & 0xffff | self.insn.imm << 16, self.name)
+
+    def op_logop_ri(self):
+        self.emit_logop(self.insn.reg2, self.block.get_reg(self.insn.reg2), self.insn.imm, self.insn.subop)
+
+    def op_xbit_ri(self):
+        self.emit_xbit(self.insn.reg2, self.block.get_reg(self.isa.flags), self.insn.imm)
+
+    def op_bra(self):
+        block = self.block
+        subop = self.insn.subop
+        target = ExprConst(self.insn.imm + self.origpos)
+        if subop in range(0x00, 0x0c):
+            pred = block.get_reg(self.isa.flags.fields[subop][2])
+        elif subop in range(0x0c, 0x0e):
+            pred = block.get_reg(self.isa.cf) | block.get_reg(self.isa.zf)
+            if subop == 0xc:
+                pred = pred ^ 1
+        elif subop in range(0x10, 0x1c):
+            pred = block.get_reg(self.isa.flags.fields[subop - 0x10][2]) ^ 1
+        else:
+            pred = block.get_reg(self.isa.sf) ^ block.get_reg(self.isa.of)
+            if subop in [0x1c, 0x1d]:
+                pred |= block.get_reg(self.isa.zf)
+            if subop in [0x1c, 0x1f]:
+                pred ^= 1
+        block.emit_bra(self.name, pred, target)
+
+    def op_jmp_rel(self):
+        self.block.emit_jmp(self.name, ExprConst(self.insn.imm + self.origpos))
+
+    def op_jmp(self):
+        self.block.emit_jmp(self.name, ExprConst(self.insn.imm))
+
+    def op_call(self):
+        self.block.emit_call(self.name, ExprConst(self.insn.imm))
+
+    def op_sleep(self):
+        block = self.block
+        block.emit_exec(self.name, self.isa.sleep, [block.get_reg(self.isa.flags) >> (self.insn.imm & 0x1f)])
+
+    def op_addsp(self):
+        block = self.block
+        block.set_reg(self.isa.sp, block.get_reg(self.isa.sp) + self.insn.imm, self.name)
+
+    def op_bset_flags(self):
+        block = self.block
+        block.set_reg(self.isa.flags, block.get_reg(self.isa.flags) | 1 << self.insn.imm, self.name)
+
+    def op_bclr_flags(self):
+        block = self.block
+        block.set_reg(self.isa.flags, block.get_reg(self.isa.flags) & ~(1 << self.insn.imm), self.name)
+
+    def op_btgl_flags(self):
+        block = self.block
+        block.set_reg(self.isa.flags, block.get_reg(self.isa.flags) ^ 1 << self.insn.imm, self.name)
+
+    def op_ret(self):
+        self.block.emit_ret()
+
+    def op_iret(self):
+        self.block.emit_iret()
+
+    def op_exit(self):
+        self.block.emit_exit()
+
+    def op_xdwait(self):
+        self.block.emit_exec(self.name, self.isa.xdwait, [])
+
+    def op_xcwait(self):
+        self.block.emit_exec(self.name, self.isa.xcwait, [])
+
+    def op_push(self):
+        block = self.block
+        block.set_reg(self.isa.sp, block.get_reg(self.isa.sp) - 4, self.name)
+        block.emit_st(self.name, self.isa.data, 4, block.get_reg(self.isa.sp), block.get_reg(self.insn.reg2))
+
+    def op_call_r(self):
+        self.block.emit_call(self.name, self.block.get_reg(self.insn.reg2))
+
+    def op_pop(self):
+        block = self.block
+        tmp = block.emit_ld(self.name, self.isa.data, 4, block.get_reg(self.isa.sp))
+        block.set_reg(self.isa.sp, block.get_reg(self.isa.sp) + 4, self.name + '_sp')
+        block.set_reg(self.insn.reg2, tmp, self.name)
+
+    def op_iowr_rr(self):
+        block = self.block
+        block.emit_exec(self.name, self.isa.iowr, [block.get_reg(self.insn.reg2), block.get_reg(self.insn.reg1)])
+
+    def op_iowrs_rr(self):
+        block = self.block
+        block.emit_exec(self.name, self.isa.iowrs, [block.get_reg(self.insn.reg2), block.get_reg(self.insn.reg1)])
+
+    def op_xfer(self):
+        block = self.block
+        if self.insn.subop == 4:
+            pshift = 0
+            spec = self.isa.xcld
+            base = self.isa.xcbase
+        elif self.insn.subop == 5:
+            pshift = 8
+            spec = self.isa.xdld
+            base = self.isa.xdbase
+        elif self.insn.subop == 6:
+            pshift = 12
+            spec = self.isa.xdst
+            base = self.isa.xdbase
+        port = block.get_reg(self.isa.xtargets) >> pshift
+        base = block.get_reg(base)
+        offs = block.get_reg(self.insn.reg2)
+        p2 = block.get_reg(self.insn.reg1)
+        addr = p2 & 0xffff
+        size = p2 >> 16
+        block.emit_exec(self.name, spec, [port, base, offs, addr, size])
+
+    def op_mul_rr(self):
+        self.emit_mul(self.insn.reg2, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_logop_rr(self):
+        self.emit_logop(self.insn.reg2, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_movsr_to(self):
+        self.block.set_reg(self.insn.sr, self.block.get_reg(self.insn.reg2), self.name)
+
+    def op_movsr_from(self):
+        self.block.set_reg(self.insn.reg1, self.block.get_reg(self.insn.sr), self.name)
+
+    def op_mul_rrr(self):
+        self.emit_mul(self.insn.reg3, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_logop_rrr(self):
+        self.emit_logop(self.insn.reg3, self.block.get_reg(self.insn.reg2), self.block.get_reg(self.insn.reg1), self.insn.subop)
+
+    def op_iord_rrr(self):
+        self.emit_iord(self.insn.reg3, self.block.get_reg(self.insn.reg2) + self.block.get_reg(self.insn.reg1) * 4)
+
     def emit_add(self, size, dst, src1, src2, subop):
         size = 8 << size
         s2 = src2
@@ -453,16 +679,17 @@ class FalconOp:
         if subop in [2, 3]:
             s2 = -src2
         res = src1 + s2
+        block = self.block
         if dst is not None:
-            self.block.set_reg(dst, res, self.name)
-        self.block.set_reg(self.isa.cf, res >> size, self.name + '_cf')
-        sign = self.block.encap(self.block.make_temp(res >> (size - 1), self.name + '_sign', 1))
-        self.block.set_reg(self.isa.of, sign ^ ExprLt(ExprSext(src1, size - 1), ExprSext(-s2, size - 1)), self.name + '_of')
-        self.block.set_reg(self.isa.sf, sign, self.name + '_sf')
+            block.set_reg(dst, res, self.name)
+        block.defer_reg(self.isa.cf, lambda: res >> size, self.name + '_cf')
+        sign = once(lambda: block.encap(block.make_temp(res >> (size - 1), self.name + '_sign', 1)))
+        block.defer_reg(self.isa.of, lambda: sign() ^ ExprLt(ExprSext(src1, size - 1), ExprSext(-s2, size - 1)), self.name + '_of')
+        block.defer_reg(self.isa.sf, sign, self.name + '_sf')
         if subop == 2:
-            self.block.set_reg(self.isa.zf, ExprEq(src1, src2), self.name + '_zf')
+            block.defer_reg(self.isa.zf, lambda: ExprEq(src1, src2), self.name + '_zf')
         else:
-            self.block.set_reg(self.isa.zf, ExprEq(res & bflmask(size), 0), self.name + '_zf')
+            block.defer_reg(self.isa.zf, lambda: ExprEq(res & bflmask(size), 0), self.name + '_zf')
 
     def emit_shift(self, size, dst, src1, src2, subop):
         shcnt = src2 & bflmask(size + 3)
@@ -471,20 +698,22 @@ class FalconOp:
             res = src1 << shcnt
             if subop == 0xc:
                 res |= self.block.get_reg(self.isa.cf) << (shcnt - 1)
-            cf = res >> size
+            cf = lambda: res >> size
         else:
-            cf = src1 >> (shcnt - 1)
+            cf = lambda: src1 >> (shcnt - 1)
+            val = src1
             if subop == 7:
-                src1 = ExprSext(src1, size - 1)
+                val = ExprSext(src1, size - 1)
             elif subop == 0xd:
-                src1 |= self.block.get_reg(self.isa.cf) << size
-            res = src1 >> shcnt
-        self.block.set_reg(dst, res, self.name)
-        self.block.set_reg(self.isa.cf, cf, self.name + '_cf')
+                val = src1 | self.block.get_reg(self.isa.cf) << size
+            res = val >> shcnt
+        block = self.block
+        block.set_reg(dst, res, self.name)
+        block.defer_reg(self.isa.cf, cf, self.name + '_cf')
         if self.isa.version != 0:
-            self.block.set_reg(self.isa.of, ExprConst(0), self.name + '_of')
-            self.block.set_reg(self.isa.sf, res >> (size - 1), self.name + '_sf')
-            self.block.set_reg(self.isa.zf, ExprEq(res, 0), self.name + '_zf')
+            block.set_reg(self.isa.of, ExprConst(0), self.name + '_of')
+            block.defer_reg(self.isa.sf, lambda: res >> (size - 1), self.name + '_sf')
+            block.defer_reg(self.isa.zf, lambda: ExprEq(res, 0), self.name + '_zf')
 
     def emit_logop(self, dst, src1, src2, subop):
         if subop == 4:
@@ -493,12 +722,13 @@ class FalconOp:
             res = src1 | src2
         elif subop == 6:
             res = src1 ^ src2
-        self.block.set_reg(dst, res, self.name)
+        block = self.block
+        block.set_reg(dst, res, self.name)
         if self.isa.version != 0:
-            self.block.set_reg(self.isa.cf, ExprConst(0), self.name + '_cf')
-            self.block.set_reg(self.isa.of, ExprConst(0), self.name + '_of')
-            self.block.set_reg(self.isa.sf, res >> 31, self.name + '_sf')
-            self.block.set_reg(self.isa.zf, ExprEq(res, 0), self.name + '_zf')
+            block.set_reg(self.isa.cf, ExprConst(0), self.name + '_cf')
+            block.set_reg(self.isa.of, ExprConst(0), self.name + '_of')
+            block.defer_reg(self.isa.sf, lambda: res >> 31, self.name + '_sf')
+            block.defer_reg(self.isa.zf, lambda: ExprEq(res, 0), self.name + '_zf')
 
     def emit_extr(self, dst, src1, src2, subop):
         low = src2 & 0x1f
@@ -507,9 +737,10 @@ class FalconOp:
         if subop == 3:
             # XXX doesn't match hw if low+size > 0x20
             res = ExprSext(res, size - 1)
-        self.block.set_reg(dst, res, self.name)
-        self.block.set_reg(self.isa.sf, res >> 31, self.name + '_sf')
-        self.block.set_reg(self.isa.zf, ExprEq(res, 0), self.name + '_zf')
+        block = self.block
+        block.set_reg(dst, res, self.name)
+        block.defer_reg(self.isa.sf, lambda: res >> 31, self.name + '_sf')
+        block.defer_reg(self.isa.zf, lambda: ExprEq(res, 0), self.name + '_zf')
 
     def emit_xbit(self, dst, src1, src2):
         if self.isa.version == 0:
@@ -517,9 +748,10 @@ class FalconOp:
             self.block.set_reg(dst, res, self.name)
         else:
             res = src1 >> src2 & 1
-            self.block.set_reg(dst, res, self.name)
-            self.block.set_reg(self.isa.sf, res >> 31, self.name + '_sf')
-            self.block.set_reg(self.isa.zf, ExprEq(res, 0), self.name + '_zf')
+            block = self.block
+            block.set_reg(dst, res, self.name)
+            block.defer_reg(self.isa.sf, lambda: res >> 31, self.name + '_sf')
+            block.defer_reg(self.isa.zf, lambda: ExprEq(res, 0), self.name + '_zf')
 
     def emit_iord(self, dst, addr):
         res, = self.block.emit_exec(self.name, self.isa.iord, [addr])
@@ -528,10 +760,11 @@ class FalconOp:
     def emit_not(self, size, dst, src):
         size = 8 << size
         res = src ^ bflmask(size)
-        self.block.set_reg(dst, res, self.name)
-        self.block.set_reg(self.isa.of, ExprConst(0), self.name + '_of')
-        self.block.set_reg(self.isa.sf, res >> (size - 1), self.name + '_sf')
-        self.block.set_reg(self.isa.zf, ExprEq(res, 0), self.name + '_zf')
+        block = self.block
+        block.set_reg(dst, res, self.name)
+        block.set_reg(self.isa.of, ExprConst(0), self.name + '_of')
+        block.defer_reg(self.isa.sf, lambda: res >> (size - 1), self.name + '_sf')
+        block.defer_reg(self.isa.zf, lambda: ExprEq(res, 0), self.name + '_zf')
 
     def emit_mul(self, dst, src1, src2, subop):
         if subop == 0:
@@ -541,3 +774,80 @@ class FalconOp:
             s1 = ExprSext(src1, 15)
             s2 = ExprSext(src2, 15)
         self.block.set_reg(dst, s1 * s2, self.name)
+
+FalconOp.cfclass = {
+    FalconOp.op_bra: ISA_CF_BRA,
+    FalconOp.op_jmp_rel: ISA_CF_JMP,
+    FalconOp.op_jmp: ISA_CF_JMP,
+    FalconOp.op_call: ISA_CF_CALL,
+    FalconOp.op_call_r: ISA_CF_CALL,
+    FalconOp.op_ret: ISA_CF_STOP,
+    FalconOp.op_iret: ISA_CF_STOP,
+    FalconOp.op_exit: ISA_CF_STOP,
+}
+
+ADD_NAMES = {0: 'add', 1: 'adc', 2: 'sub', 3: 'sbb'}
+SHIFT_NAMES = {4: 'shl', 5: 'shr', 7: 'sar', 0xc: 'shlc', 0xd: 'shrc'}
+LOGOP_NAMES = {4: 'and', 5: 'or', 6: 'xor'}
+MUL_NAMES = {0: 'mulu', 1: 'muls'}
+
+PRED_NAMES = {0xc: 'a', 0xd: 'na', 0x1c: 'g', 0x1d: 'le', 0x1e: 'l', 0x1f: 'ge'}
+for idx, name in enumerate(['p{}'.format(idx) for idx in range(8)] + ['c', 'o', 's', 'z']):
+    PRED_NAMES[idx] = name
+    PRED_NAMES[idx | 0x10] = 'n' + name
+
+FalconOp.syntax = {
+    FalconOp.op_st: ('st', '{sz} D[{r2} + {off:#x}] {r1}'),
+    FalconOp.op_stsp: ('st', '{sz} D[$sp + {off:#x}] {r2}'),
+    FalconOp.op_ld: ('ld', '{sz} {r1} D[{r2} + {off:#x}]'),
+    FalconOp.op_ldsp: ('ld', '{sz} {r2} D[$sp + {off:#x}]'),
+    FalconOp.op_movi: ('mov', '{r2} {imm:#x}'),
+    FalconOp.op_clear: ('clear', '{sz} {r2}'),
+    FalconOp.op_add_rri: (ADD_NAMES, '{sz} {r1} {r2} {imm:#x}'),
+    FalconOp.op_shift_rri: (SHIFT_NAMES, '{sz} {r1} {r2} {imm:#x}'),
+    FalconOp.op_add_ri: (ADD_NAMES, '{sz} {r2} {imm:#x}'),
+    FalconOp.op_shift_ri: (SHIFT_NAMES, '{sz} {r2} {imm:#x}'),
+    FalconOp.op_cmp_ri: ('cmp', '{sz} {r2} {imm:#x}'),
+    FalconOp.op_add_rr: (ADD_NAMES, '{sz} {r2} {r1}'),
+    FalconOp.op_shift_rr: (SHIFT_NAMES, '{sz} {r2} {r1}'),
+    FalconOp.op_cmp_rr: ('cmp', '{sz} {r2} {r1}'),
+    FalconOp.op_add_rrr: (ADD_NAMES, '{sz} {r3} {r2} {r1}'),
+    FalconOp.op_shift_rrr: (SHIFT_NAMES, '{sz} {r3} {r2} {r1}'),
+    FalconOp.op_not: ('not', '{sz} {r1} {r2}'),
+    FalconOp.op_extr_rri: ({3: 'extrs', 7: 'extr'}, '{r1} {r2} {imm:#x}'),
+    FalconOp.op_logop_rri: (LOGOP_NAMES, '{r1} {r2} {imm:#x}'),
+    FalconOp.op_iord_rri: ('iord', '{r1} I[{r2} + {ioff:#x}]'),
+    FalconOp.op_iowr_rri: ('iowr', 'I[{r2} + {ioff:#x}] {r1}'),
+    FalconOp.op_mulu_ri: ('mulu', '{r2} {imm:#x}'),
+    FalconOp.op_muls_ri: ('muls', '{r2} {imm:#x}'),
+    FalconOp.op_sethi: ('sethi', '{r2} {imm:#x}'),
+    FalconOp.op_logop_ri: (LOGOP_NAMES, '{r2} {imm:#x}'),
+    FalconOp.op_xbit_ri: ('xbit', '{r2} $flags {imm:#x}'),
+    FalconOp.op_bra: ('bra', '{pred} {target:#x}'),
+    FalconOp.op_jmp_rel: ('bra', '{target:#x}'),
+    FalconOp.op_jmp: ('jmp', '{target:#x}'),
+    FalconOp.op_call: ('call', '{target:#x}'),
+    FalconOp.op_sleep: ('sleep', '{imm:#x}'),
+    FalconOp.op_addsp: ('add', '$sp {imm:#x}'),
+    FalconOp.op_bset_flags: ('bset', '$flags {imm:#x}'),
+    FalconOp.op_bclr_flags: ('bclr', '$flags {imm:#x}'),
+    FalconOp.op_btgl_flags: ('btgl', '$flags {imm:#x}'),
+    FalconOp.op_ret: ('ret', ''),
+    FalconOp.op_iret: ('iret', ''),
+    FalconOp.op_exit: ('exit', ''),
+    FalconOp.op_xdwait: ('xdwait', ''),
+    FalconOp.op_xcwait: ('xcwait', ''),
+    FalconOp.op_push: ('push', '{r2}'),
+    FalconOp.op_call_r: ('call', '{r2}'),
+    FalconOp.op_pop: ('pop', '{r2}'),
+    FalconOp.op_iowr_rr: ('iowr', 'I[{r2}] {r1}'),
+    FalconOp.op_iowrs_rr: ('iowrs', 'I[{r2}] {r1}'),
+    FalconOp.op_xfer: ({4: 'xcld', 5: 'xdld', 6: 'xdst'}, '{r2} {r1}'),
+    FalconOp.op_mul_rr: (MUL_NAMES, '{r2} {r1}'),
+    FalconOp.op_logop_rr: (LOGOP_NAMES, '{r2} {r1}'),
+    FalconOp.op_movsr_to: ('mov', '{sr} {r2}'),
+    FalconOp.op_movsr_from: ('mov', '{r1} {sr}'),
+    FalconOp.op_mul_rrr: (MUL_NAMES, '{r3} {r2} {r1}'),
+    FalconOp.op_logop_rrr: (LOGOP_NAMES, '{r3} {r2} {r1}'),
+    FalconOp.op_iord_rrr: ('iord', '{r3} I[{r2} + {r1} * 4]'),
+}
@@ -1,9 +1,13 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
 from envy.util import extr, extrs, bflmask
 from envy.deco.expr.const import ExprConst
 from envy.deco.expr.logop import ExprSext
 from envy.deco.expr.cmp import ExprEq
 from envy.deco import DecodeError
-from envy.isa import Isa, IsaReg, IsaSplitReg, IsaMem, ISA_MEM_RO, IsaExec
+from envy.isa import Isa, IsaReg, IsaSplitReg, IsaMem, ISA_MEM_RO, IsaExec, ISA_CF_NONE, ISA_CF_STOP
 
 
 class Vp2MacroIsa(Isa):
@@ -25,61 +29,108 @@ class Vp2MacroIsa(Isa):
         self.submit = IsaExec('submit', (), (0x1fffc, bflmask(32), bflmask(8)))
         self.codemem = IsaMem('C', 64, 0x1ff, ISA_MEM_RO)
 
+    def decode_insn(self, section, pos):
+        op = section.get(pos, 8)
+        return Vp2MacroInsn(pos, op, [[val] for val in decode_fields(op)], 0)
+
+    def decode_range(self, section, start, end):
+        # the fields stay in per-field columns, each insn only remembers
+        # its row and reads them when lifted.
+        end = min(end, section.end)
+        num = max(end - start, 0) // 8
+        if np is None:
+            words = [section.get(start + idx * 8, 8) for idx in range(num)]
+            cols = decode_columns(words)
+        else:
+            words = np.frombuffer(section[start:start + num * 8], dtype='<u8')
+            fields = decode_array(words)
+            cols = [fields[name].tolist() for name, _, _, _ in FIELDS]
+            words = words.tolist()
+        res = {}
+        for idx, op in enumerate(words):
+            pos = start + idx * 8
+            try:
+                res[pos] = Vp2MacroInsn(pos, op, cols, idx)
+            except DecodeError as err:
+                res[pos] = err
+        return res
+
     def decode(self, name, block, pos):
-        op = block.section.get(pos, 8)
-        Vp2MacroOp(name, block, op)
-        return pos + 8
+        insn = block.section.decode(self, pos)
+        Vp2MacroOp(name, block, insn)
+        return insn.end
 
 isa = Vp2MacroIsa()
 
 
+class Vp2MacroField:
+    # one field of an insn, read from its column.
+    def __init__(self, idx):
+        self.idx = idx
+
+    def __get__(self, insn, cls):
+        if insn is None:
+            return self
+        return insn.cols[self.idx][insn.row]
+
+
+class Vp2MacroInsn:
+    # the fields are Vp2MacroFields, set up after FIELDS.
+    __slots__ = ('pos', 'end', 'opcode', 'cols', 'row')
+
+    target = None
+
+    def __init__(self, pos, opcode, cols, row):
+        self.pos = pos
+        self.end = pos + 8
+        self.opcode = opcode
+        self.cols = cols
+        self.row = row
+
+        if opcode & PRED_BITS:
+            # XXX
+            raise DecodeError('predicate')
+
+    @property
+    def cf(self):
+        return ISA_CF_STOP if self.exit else ISA_CF_NONE
+
+    def __str__(self):
+        res = 'c:{} d:{}'.format(COP_NAMES[self.cop], DOP_NAMES[self.dop])
+        if self.submit:
+            res += ' submit'
+        if self.exit:
+            res += ' exit'
+        return res
+
+
+def decode_fields(op):
+    return [extrs(op, start, len_) if signed else extr(op, start, len_) for _, start, len_, signed in FIELDS]
+
+
+def decode_columns(words):
+    # all fields of a list of words, one list per field.
+    return [[extrs(op, start, len_) if signed else extr(op, start, len_) for op in words] for _, start, len_, signed in FIELDS]
+
+
+def decode_array(words):
+    # all fields of an array of uint64 words, one column at a time.
+    res = np.empty(len(words), dtype=[(name, '<i8') for name, _, _, _ in FIELDS])
+    for name, start, len_, signed in FIELDS:
+        val = (words >> start & bflmask(len_)).astype(np.int64)
+        if signed:
+            val = (val ^ 1 << (len_ - 1)) - (1 << (len_ - 1))
+        res[name] = val
+    return res
+
+
 class Vp2MacroOp:
-    def __init__(self, name, block, op):
-        self.opcode = op
+    def __init__(self, name, block, insn):
+        self.insn = insn
         self.name = name
         self.block = block
-
-        self.pred = extr(op, 0, 2)
-        self.pnot = extr(op, 2, 1)
-        self.exit = extr(op, 3, 1)
-        self.submit = extr(op, 4, 1)
-
-        self.cbfstart = extr(op, 5, 5)
-        self.cbfend = extr(op, 10, 5)
-        self.cshift = extr(op, 15, 5)
-        self.cshdir = extr(op, 20, 1)
-        self.cimm6 = extr(op, 15, 6)
-        self.csrc2 = extr(op, 21, 2)
-        self.cimm8 = extr(op, 15, 8)
-        self.cimm18 = extrs(op, 5, 18)
-        self.csrc1 = extr(op, 23, 4)
-        self.cdst = extr(op, 27, 2)
-        self.cop = extr(op, 29, 2)
-
-        self.pdst = extr(op, 31, 2)
-
-        self.dbfstart = extr(op, 33, 5)
-        self.dbfend = extr(op, 38, 5)
-        self.dshift = extr(op, 43, 5)
-        self.dshdir = extr(op, 48, 1)
-        self.dimm6 = extr(op, 43, 6)
-        self.dimm16 = extr(op, 33, 16)
-        self.c2den = extr(op, 49, 1)
-        self.ddstskip = extr(op, 49, 1)
-        self.dsub = extr(op, 49, 1)
-        self.dlogop = extr(op, 49, 2)
-        self.dsrc2 = extr(op, 50, 2)
-        self.dhi2 = extr(op, 50, 1)
-        self.dhi = extr(op, 51, 1)
-        self.dsrc1 = extr(op, 52, 4)
-        self.dimm23 = extrs(op, 33, 23)
-        self.drdst = extr(op, 56, 4)
-        self.ddst = extr(op, 60, 1)
-        self.dop = extr(op, 61, 3)
-
         self.luttmp = None
-
-        self.decode()
+        self.lift()
 
     def get_gpr(self, idx):
         if isa.gpr[idx] is None:
@@ -90,152 +141,149 @@ class Vp2MacroOp:
             return self.block.get_reg(isa.gpr[idx])
 
     def get_csrc1(self):
-        return self.get_gpr(self.csrc1)
+        return self.get_gpr(self.insn.csrc1)
 
     def get_csrc2(self):
-        if self.csrc2 == 0:
+        if self.insn.csrc2 == 0:
             return ExprConst(0)
-        elif self.csrc2 == 1:
+        elif self.insn.csrc2 == 1:
             return self.block.get_reg(isa.cacc)
-        elif self.csrc2 == 2:
+        elif self.insn.csrc2 == 2:
             return self.block.get_reg(isa.dacc)
-        elif self.csrc2 == 3:
+        elif self.insn.csrc2 == 3:
             return self.get_csrc1()
         else:
             assert 0
 
     def get_dsrc1(self):
-        return self.get_gpr(self.dsrc1)
+        return self.get_gpr(self.insn.dsrc1)
 
     def get_dsrc2(self):
-        if self.dsrc2 == 0:
+        if self.insn.dsrc2 == 0:
             return ExprConst(0)
-        elif self.dsrc2 == 1:
+        elif self.insn.dsrc2 == 1:
             return self.block.get_reg(isa.cacc)
-        elif self.dsrc2 == 2:
+        elif self.insn.dsrc2 == 2:
             return self.block.get_reg(isa.dacc)
-        elif self.dsrc2 == 3:
+        elif self.insn.dsrc2 == 3:
             return self.get_dsrc1()
         else:
             assert 0
 
-    def decode(self):
-        if self.pred or self.pnot:
-            # XXX
-            raise DecodeError('predicate')
-        if self.submit:
+    def lift(self):
+        if self.insn.submit:
             cmd = self.block.get_reg(isa.cmd)
             data = self.block.get_reg(isa.data)
             datahi = self.block.get_reg(isa.datahi)
             self.block.emit_exec(self.name, isa.submit, [cmd, data, datahi])
             # XXX auto-increment
 
-        if self.cbfend >= self.cbfstart:
-            cbfmask = (2 << self.cbfend) - (1 << self.cbfstart)
+        if self.insn.cbfend >= self.insn.cbfstart:
+            cbfmask = (2 << self.insn.cbfend) - (1 << self.insn.cbfstart)
         else:
             cbfmask = 0
 
         pres = ExprConst(0)
-        if self.cop == CINSRT_R:
-            if self.cshdir == 0:
-                ssrc = self.get_csrc1() << self.cshift
+        if self.insn.cop == CINSRT_R:
+            if self.insn.cshdir == 0:
+                ssrc = self.get_csrc1() << self.insn.cshift
             else:
-                ssrc = self.get_csrc1() >> self.cshift
+                ssrc = self.get_csrc1() >> self.insn.cshift
             tmp = ssrc & cbfmask
             c2d = cres = tmp | (self.get_csrc2() & ~cbfmask)
             pres = ExprEq(tmp, 0)
-        elif self.cop == CINSRT_I:
-            c2d = cres = (self.get_csrc2() & ~cbfmask) | (self.cimm6 << self.cbfstart & cbfmask)
-        elif self.cop == CMOV_I:
-            c2d = cres = ExprConst(self.cimm18)
-        elif self.cop == CEXTRADD8:
-            c2d = (self.get_csrc1() & cbfmask) >> self.cbfstart
-            cres = ((c2d + self.cimm8) & 0xff) | (c2d & ~0xff)
+        elif self.insn.cop == CINSRT_I:
+            c2d = cres = (self.get_csrc2() & ~cbfmask) | (self.insn.cimm6 << self.insn.cbfstart & cbfmask)
+        elif self.insn.cop == CMOV_I:
+            c2d = cres = ExprConst(self.insn.cimm18)
+        elif self.insn.cop == CEXTRADD8:
+            c2d = (self.get_csrc1() & cbfmask) >> self.insn.cbfstart
+            cres = ((c2d + self.insn.cimm8) & 0xff) | (c2d & ~0xff)
         else:
             assert 0
 
-        if self.dbfend >= self.dbfstart:
-            dbfmask = (2 << self.dbfend) - (1 << self.dbfstart)
+        if self.insn.dbfend >= self.insn.dbfstart:
+            dbfmask = (2 << self.insn.dbfend) - (1 << self.insn.dbfstart)
         else:
             dbfmask = 0
 
         ddst_skip = False
-        if self.dop == DINSRT_R:
-            if self.dshdir == 0:
-                ssrc = self.get_dsrc1() << self.dshift
+        if self.insn.dop == DINSRT_R:
+            if self.insn.dshdir == 0:
+                ssrc = self.get_dsrc1() << self.insn.dshift
             else:
-                ssrc = ExprSext(self.get_dsrc1(), 31) >> self.dshift
+                ssrc = ExprSext(self.get_dsrc1(), 31) >> self.insn.dshift
             tmp = ssrc & dbfmask
             dres = tmp | (self.get_dsrc2() & ~dbfmask)
-            if self.c2den:
+            if self.insn.c2den:
                 dres = (c2d & cbfmask) | (dres & ~cbfmask)
             pres = ExprEq(tmp, 0)
-        elif self.dop == DINSRT_I:
-            dres = (self.get_dsrc2() & ~dbfmask) | (self.dimm6 << self.dbfstart & dbfmask)
-            if self.c2den:
+        elif self.insn.dop == DINSRT_I:
+            dres = (self.get_dsrc2() & ~dbfmask) | (self.insn.dimm6 << self.insn.dbfstart & dbfmask)
+            if self.insn.c2den:
                 dres = (c2d & cbfmask) | (dres & ~cbfmask)
-        elif self.dop == DMOV_I:
-            dres = ExprConst(self.dimm23)
-        elif self.dop == DADD16_I:
-            src1 = (self.get_dsrc1() >> (self.dhi * 16)) & 0xffff
-            sum_ = (src1 + self.dimm16) & 0xffff
-            dres = (self.get_dsrc1() & ~(0xffff << 16 * self.dhi)) | (sum_ << (16 * self.dhi))
+        elif self.insn.dop == DMOV_I:
+            dres = ExprConst(self.insn.dimm23)
+        elif self.insn.dop == DADD16_I:
+            src1 = (self.get_dsrc1() >> (self.insn.dhi * 16)) & 0xffff
+            sum_ = (src1 + self.insn.dimm16) & 0xffff
+            dres = (self.get_dsrc1() & ~(0xffff << 16 * self.insn.dhi)) | (sum_ << (16 * self.insn.dhi))
             pres = sum_ >> 15 & 1
-            ddst_skip = self.ddstskip
-        elif self.dop == DLOGOP16_I:
+            ddst_skip = self.insn.ddstskip
+        elif self.insn.dop == DLOGOP16_I:
             src = self.get_dsrc1()
-            if self.dhi:
+            if self.insn.dhi:
                 src = src >> 16
             src = src & 0xffff
-            if self.dlogop == 0:
-                res = ExprConst(self.dimm16)
-            elif self.dlogop == 1:
-                res = src & self.dimm16
-            elif self.dlogop == 2:
-                res = src | self.dimm16
-            elif self.dlogop == 3:
-                res = src ^ self.dimm16
-            if self.dhi:
+            if self.insn.dlogop == 0:
+                res = ExprConst(self.insn.dimm16)
+            elif self.insn.dlogop == 1:
+                res = src & self.insn.dimm16
+            elif self.insn.dlogop == 2:
+                res = src | self.insn.dimm16
+            elif self.insn.dlogop == 3:
+                res = src ^ self.insn.dimm16
+            if self.insn.dhi:
                 dres = (self.get_dsrc1() & ~0xffff0000) | (res << 16)
             else:
                 dres = (self.get_dsrc1() & ~0xffff) | res
             pres = ExprEq(res, 0)
-        elif self.dop == DSHIFT_R:
+        elif self.insn.dop == DSHIFT_R:
             shift = self.get_csrc1() & 0x1f
-            if self.dshdir == 0:
+            if self.insn.dshdir == 0:
                 dres = self.get_dsrc1() << shift
             else:
                 dres = ExprSext(self.get_dsrc1(), 31) >> shift
-        elif self.dop == DSEXT:
-            bfstart = max(self.dbfstart, self.dshift)
-            if self.dbfend >= bfstart:
-                dbfmask = (2 << self.dbfend) - (1 << bfstart)
+        elif self.insn.dop == DSEXT:
+            bfstart = max(self.insn.dbfstart, self.insn.dshift)
+            if self.insn.dbfend >= bfstart:
+                dbfmask = (2 << self.insn.dbfend) - (1 << bfstart)
             else:
                 dbfmask = 0
-            pres = self.get_dsrc2() >> self.dshift & 1
-            dres = (self.get_dsrc2() & ~dbfmask) | (ExprSext(self.get_dsrc2(), self.dshift) & dbfmask)
-        elif self.dop == DADD16_R:
-            src1 = (self.get_dsrc1() >> (self.dhi * 16)) & 0xffff
-            src2 = (self.get_csrc1() >> (self.dhi2 * 16)) & 0xffff
-            if self.dsub == 0:
+            pres = self.get_dsrc2() >> self.insn.dshift & 1
+            dres = (self.get_dsrc2() & ~dbfmask) | (ExprSext(self.get_dsrc2(), self.insn.dshift) & dbfmask)
+        elif self.insn.dop == DADD16_R:
+            src1 = (self.get_dsrc1() >> (self.insn.dhi * 16)) & 0xffff
+            src2 = (self.get_csrc1() >> (self.insn.dhi2 * 16)) & 0xffff
+            if self.insn.dsub == 0:
                 sum_ = (src1 + src2) & 0xffff
             else:
                 sum_ = (src2 - src2) & 0xffff
-            dres = (self.get_dsrc1() & ~(0xffff << 16 * self.dhi)) | (sum_ << (16 * self.dhi))
+            dres = (self.get_dsrc1() & ~(0xffff << 16 * self.insn.dhi)) | (sum_ << (16 * self.insn.dhi))
             pres = sum_ >> 15 & 1
         else:
             assert 0
 
-        self.block.set_reg(isa.csr[self.cdst], cres, self.name + '_cres')
+        self.block.set_reg(isa.csr[self.insn.cdst], cres, self.name + '_cres')
         dres = self.block.encap(self.block.make_temp(dres, self.name + '_dres', bflmask(32)))
         if not ddst_skip:
-            self.block.set_reg(isa.dsr[self.ddst], dres, self.name + '_dres_dsr')
-        if self.drdst != 14:
-            self.block.set_reg(isa.gpr[self.drdst], dres, self.name + '_dres_gpr')
-        if self.pdst:
-            self.block.set_reg(isa.p[self.pdst], pres, self.name + '_pres')
+            self.block.set_reg(isa.dsr[self.insn.ddst], dres, self.name + '_dres_dsr')
+        if self.insn.drdst != 14:
+            self.block.set_reg(isa.gpr[self.insn.drdst], dres, self.name + '_dres_gpr')
+        if self.insn.pdst:
+            self.block.set_reg(isa.p[self.insn.pdst], pres, self.name + '_pres')
 
-        if self.exit:
+        if self.insn.exit:
             self.block.emit_exit()
 
 CINSRT_R = 0
@@ -251,3 +299,52 @@ DLOGOP16_I = 4
 DSHIFT_R = 5
 DSEXT = 6
 DADD16_R = 7
+
+COP_NAMES = ['insrt_r', 'insrt_i', 'mov_i', 'extradd8']
+DOP_NAMES = ['insrt_r', 'insrt_i', 'mov_i', 'add16_i', 'logop16_i', 'shift_r', 'sext', 'add16_r']
+
+FIELDS = [
+    ('pred', 0, 2, False),
+    ('pnot', 2, 1, False),
+    ('exit', 3, 1, False),
+    ('submit', 4, 1, False),
+
+    ('cbfstart', 5, 5, False),
+    ('cbfend', 10, 5, False),
+    ('cshift', 15, 5, False),
+    ('cshdir', 20, 1, False),
+    ('cimm6', 15, 6, False),
+    ('csrc2', 21, 2, False),
+    ('cimm8', 15, 8, False),
+    ('cimm18', 5, 18, True),
+    ('csrc1', 23, 4, False),
+    ('cdst', 27, 2, False),
+    ('cop', 29, 2, False),
+
+    ('pdst', 31, 2, False),
+
+    ('dbfstart', 33, 5, False),
+    ('dbfend', 38, 5, False),
+    ('dshift', 43, 5, False),
+    ('dshdir', 48, 1, False),
+    ('dimm6', 43, 6, False),
+    ('dimm16', 33, 16, False),
+    ('c2den', 49, 1, False),
+    ('ddstskip', 49, 1, False),
+    ('dsub', 49, 1, False),
+    ('dlogop', 49, 2, False),
+    ('dsrc2', 50, 2, False),
+    ('dhi2', 50, 1, False),
+    ('dhi', 51, 1, False),
+    ('dsrc1', 52, 4, False),
+    ('dimm23', 33, 23, True),
+    ('drdst', 56, 4, False),
+    ('ddst', 60, 1, False),
+    ('dop', 61, 3, False),
+]
+
+# pred and pnot, which nothing decodes yet.
+PRED_BITS = bflmask(3)
+
+for idx, (name, _, _, _) in enumerate(FIELDS):
+    setattr(Vp2MacroInsn, name, Vp2MacroField(idx))
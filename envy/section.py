@@ -1,10 +1,101 @@
+import mmap
+import struct
+from bisect import bisect_right
+from envy.deco import DecodeError
+
+UNPACK = {1: struct.Struct('<B'), 2: struct.Struct('<H'), 4: struct.Struct('<I'), 8: struct.Struct('<Q')}
+
+
+class IntervalIndex:
+    # elementary segments: bounds[i]..bounds[i+1] is owned by owners[i].
+    def __init__(self):
+        self.bounds = []
+        self.owners = []
+        self.ranges = {}
+
+    def split(self, addr):
+        idx = bisect_right(self.bounds, addr)
+        if idx and self.bounds[idx - 1] == addr:
+            return idx - 1
+        self.bounds.insert(idx, addr)
+        self.owners.insert(idx, set(self.owners[idx - 1]) if idx else set())
+        return idx
+
+    def merge(self, start, end):
+        # drops redundant bounds around a modified range.
+        lo = bisect_right(self.bounds, start) - 1
+        idx = bisect_right(self.bounds, end)
+        while idx >= max(lo, 0):
+            if idx < len(self.bounds) and self.owners[idx] == (self.owners[idx - 1] if idx else set()):
+                del self.bounds[idx]
+                del self.owners[idx]
+            idx -= 1
+
+    def set_ranges(self, obj, ranges):
+        for start, end in self.ranges.pop(obj, []):
+            for idx in range(self.split(start), self.split(end)):
+                self.owners[idx].discard(obj)
+            self.merge(start, end)
+        merged = []
+        for start, end in sorted(ranges):
+            if start >= end:
+                continue
+            if merged and merged[-1][1] >= start:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        for start, end in merged:
+            for idx in range(self.split(start), self.split(end)):
+                self.owners[idx].add(obj)
+            self.merge(start, end)
+        if merged:
+            self.ranges[obj] = merged
+
+    def lookup(self, addr):
+        idx = bisect_right(self.bounds, addr) - 1
+        if idx < 0:
+            return set()
+        return set(self.owners[idx])
+
+    def segments(self, start, end):
+        res = []
+        idx = bisect_right(self.bounds, start) - 1
+        pos = start
+        while pos < end:
+            owners = self.owners[idx] if idx >= 0 else set()
+            idx += 1
+            nxt = min(self.bounds[idx], end) if idx < len(self.bounds) else end
+            res.append((pos, nxt, owners))
+            pos = nxt
+        return res
+
+    def overlaps(self):
+        res = []
+        for idx, owners in enumerate(self.owners):
+            if len(owners) > 1:
+                res.append((self.bounds[idx], self.bounds[idx + 1], owners))
+        return res
+
+
 class ImageSection:
     def __init__(self, base, data):
         self.base = base
-        self.data = data
-        self.end = base + len(data)
+        self.data = memoryview(data).cast('B')
+        self.end = base + len(self.data)
         self.range = range(self.base, self.end)
         self.objects = {}
+        self.insns = {}
+        self.owners = IntervalIndex()
+
+    @classmethod
+    def open(cls, base, fname):
+        with open(fname, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file, can't be mapped.
+                data = b''
+        return cls(base, data)
 
     def __getitem__(self, idx):
         if isinstance(idx, slice):
@@ -15,8 +106,43 @@ class ImageSection:
 
     def get(self, addr, blen):
         offs = addr - self.base
+        if blen in UNPACK and offs >= 0 and offs + blen <= len(self.data):
+            return UNPACK[blen].unpack_from(self.data, offs)[0]
         return int.from_bytes(self.data[offs:offs + blen], 'little')
 
+    def decode(self, isa, addr):
+        if isa not in self.insns:
+            self.insns[isa] = {}
+        insns = self.insns[isa]
+        if addr not in insns:
+            try:
+                insns[addr] = isa.decode_insn(self, addr)
+            except DecodeError as err:
+                insns[addr] = err
+        insn = insns[addr]
+        if isinstance(insn, DecodeError):
+            raise insn.with_traceback(None)
+        return insn
+
+    def predecode(self, isa, start, end):
+        if isa not in self.insns:
+            self.insns[isa] = {}
+        insns = self.insns[isa]
+        for addr, insn in isa.decode_range(self, start, end).items():
+            if addr not in insns:
+                insns[addr] = insn
+
+    def disasm(self, isa, start, end):
+        pos = start
+        while pos < end:
+            try:
+                insn = self.decode(isa, pos)
+            except DecodeError as err:
+                print("{:08x}: ??? {}".format(pos, err))
+                return
+            print("{:08x}: {}".format(pos, insn))
+            pos = insn.end
+
     def lookup(self, addr):
         if addr not in self.range:
             raise IndexError()
@@ -31,6 +157,28 @@ class ImageSection:
             self.objects[addr] = []
         self.objects[addr].append(obj)
 
+    def set_ranges(self, obj, ranges):
+        self.owners.set_ranges(obj, ranges)
+
+    def find_owners(self, addr):
+        if addr not in self.range:
+            raise IndexError()
+        return self.owners.lookup(addr)
+
+    def overlaps(self):
+        return self.owners.overlaps()
+
+    def print_coverage(self):
+        total = 0
+        for start, end, owners in self.owners.segments(self.base, self.end):
+            if owners:
+                total += end - start
+                desc = ', '.join(sorted(obj.name for obj in owners))
+            else:
+                desc = '-'
+            print("{:08x}-{:08x} {}".format(start, end, desc))
+        print("covered {:#x}/{:#x} bytes".format(total, self.end - self.base))
+
     def print(self):
         for addr, objects in sorted(self.objects.items()):
             for obj in objects:
@@ -39,3 +39,13 @@ def shl(a, b):
         return a << b
     else:
         return a >> -b
+
+
+def slotstate(obj):
+    # the set attributes of a slotted object, for pickling.
+    res = {}
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            if name != '__weakref__' and hasattr(obj, name):
+                res[name] = getattr(obj, name)
+    return res
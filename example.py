@@ -8,8 +8,7 @@ from envy.deco.world import World, Domain
 class ExampleBin(World):
     def __init__(self):
         super().__init__()
-        with open('example.bin', 'rb') as f:
-            code = ImageSection(0, f.read())
+        code = ImageSection.open(0, 'example.bin')
         isa = FalconIsa(3)
         domain = Domain(self, isa)
         self.domains.append(domain)
@@ -0,0 +1,36 @@
+import contextlib
+import io
+import pytest
+from envy.section import ImageSection
+from envy.isa.falcon import FalconIsa
+from envy.deco.world import World, Domain
+
+
+def falcon_world(code, version=3):
+    # code at 0 with the function there wanting $r0, like example.py.
+    world = World()
+    section = ImageSection(0, code)
+    isa = FalconIsa(version)
+    domain = Domain(world, isa)
+    world.domains.append(domain)
+    world.sections.append(section)
+    domain.add_section(isa.codemem, section)
+    domain.find_function(0).want_reg(isa.r[0], 0xffffffff)
+    return world
+
+
+def printed(world):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        world.print()
+    return out.getvalue()
+
+
+@pytest.fixture
+def decompile():
+    # code -> printed output, World.process gets the keyword args.
+    def run(code, **kwargs):
+        world = falcon_world(code)
+        world.process(**kwargs)
+        return printed(world)
+    return run
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+import pytest
+from conftest import falcon_world, printed
+from envy.deco.cache import Cache
+
+# call 0x10; ret, then at 0x10: mov $r0 0x1234; ret
+CALL = bytes.fromhex('f5211000f800').ljust(0x10, b'\0') + bytes.fromhex('f1073412f800')
+# the same with mov $r0 0x5678 in the callee.
+CALL2 = bytes.fromhex('f5211000f800').ljust(0x10, b'\0') + bytes.fromhex('f1077856f800')
+
+
+def cached(code, path):
+    world = falcon_world(code)
+    world.cache = Cache(world, str(path))
+    world.process()
+    return world
+
+
+@pytest.mark.parametrize('module', ['parallel', 'cache', 'pickling', 'func', 'world'])
+def test_import_order(module):
+    # every module works as the first one imported.
+    subprocess.run([sys.executable, '-c', 'import envy.deco.' + module], check=True)
+
+
+def test_round_trip(tmp_path, decompile):
+    first = cached(CALL, tmp_path)
+    assert first.cache.hits == 0
+    second = cached(CALL, tmp_path)
+    assert (second.cache.hits, second.cache.misses) == (first.cache.misses, 0)
+    assert printed(second) == printed(first) == decompile(CALL)
+
+
+def test_renamed(tmp_path):
+    # names aren't part of the key.
+    first = cached(CALL, tmp_path)
+    world = falcon_world(CALL)
+    world.cache = Cache(world, str(tmp_path))
+    world.domains[0].find_function(0x10).name = 'callee'
+    world.process()
+    assert (world.cache.hits, world.cache.misses) == (first.cache.misses, 0)
+
+
+def test_code_changed(tmp_path, decompile):
+    first = cached(CALL, tmp_path)
+    world = cached(CALL2, tmp_path)
+    # the callee's code is different, the caller still sees the same
+    # signature from it.
+    assert world.cache.hits == world.cache.misses == first.cache.misses // 2
+    assert printed(world) == decompile(CALL2)
+
+
+def test_corrupt(tmp_path, decompile):
+    first = cached(CALL, tmp_path)
+    files = list(tmp_path.glob('*.pickle'))
+    assert files
+    for fname in files:
+        fname.write_bytes(b'\x80\x04garbage')
+    world = cached(CALL, tmp_path)
+    assert world.cache.hits == 0
+    assert printed(world) == decompile(CALL)
+    # replaced with fresh entries.
+    second = cached(CALL, tmp_path)
+    assert second.cache.hits == first.cache.misses
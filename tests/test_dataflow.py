@@ -0,0 +1,48 @@
+from conftest import falcon_world
+from envy.deco.dataflow import Dataflow, WIDEN_AFTER
+from envy.deco.func import Liveness
+
+# mov $r0 0; 4: add $r1 $r1 1; add $r0 $r0 1; bra ne 4; ret -- $r0
+# counts until it wraps, $r1 goes nowhere.
+LOOP = bytes.fromhex('f1070000' '901101' '900001' 'f41bfa' 'f800')
+
+
+def loop_func():
+    world = falcon_world(LOOP)
+    world.process()
+    return world.domains[0].find_function(0)
+
+
+class Trips(Dataflow):
+    # times around the loop, unbounded but for widen.
+    def join(self, old, new):
+        return max(old, new)
+
+    def widen(self, old, new):
+        return float('inf')
+
+    def transfer(self, block, state):
+        for out in block.outs:
+            if out is not None:
+                yield out, state + 1
+
+
+def test_liveness():
+    func = loop_func()
+    # from the return back.
+    assert [block.name for block in Liveness(func).order()] == ['func_0_d', 'func_0_4', 'func_0_entry']
+    loop = func.cblocks[4]
+    # live around the loop, while the $r1 count is dropped.
+    assert [str(var) for var in loop.inregs.values()] == ['func_0_4_in_r0']
+    assert func.livevars[loop.inregs[func.isa.r[0]]] == 0xffffffff
+    assert len(loop.ops) == 1
+    assert func.flowstats['live']
+
+
+def test_widen():
+    func = loop_func()
+    flow = Trips(func)
+    states = flow.run([(func.eblock, 0)])
+    loop = func.cblocks[4]
+    assert states[loop] == states[func.cblocks[0xd]] == float('inf')
+    assert flow.nvisits[loop] == WIDEN_AFTER + 1
@@ -0,0 +1,64 @@
+from envy.deco.dom import DomTree, Lifting
+
+# a diamond into a loop: a -> b, c -> d <-> e -> f.  x isn't reached.
+GRAPH = {
+    'a': ['b', 'c'],
+    'b': ['d'],
+    'c': ['d'],
+    'd': ['e'],
+    'e': ['d', 'f'],
+    'f': [],
+    'x': ['d'],
+}
+
+
+def test_dominators():
+    dom = DomTree('a', GRAPH.__getitem__)
+    assert dom.rpo[0] == 'a'
+    assert set(dom.rpo) == set(GRAPH) - {'x'}
+    assert dom.idom == {'a': 'a', 'b': 'a', 'c': 'a', 'd': 'a', 'e': 'd', 'f': 'e'}
+    assert sorted(dom.preds['d']) == ['b', 'c', 'e']
+    assert dom.sizes() == {'a': 6, 'b': 1, 'c': 1, 'd': 3, 'e': 2, 'f': 1}
+
+
+def test_virtual_root():
+    # forward_ins hangs several roots off None.
+    dom = DomTree(None, lambda node: ['b', 'c'] if node is None else GRAPH[node])
+    assert dom.idom['d'] is None
+    assert dom.idom['f'] == 'e'
+
+
+def test_long_chain():
+    # no recursion on the way down.
+    num = 5000
+    dom = DomTree(0, lambda node: [node + 1] if node < num else [])
+    assert dom.idom[num] == num - 1
+    assert dom.sizes()[0] == num + 1
+
+
+def test_lifting():
+    # 0 - 1 - ... - 99, with 200 + i hanging off i.
+    parent = {}
+    depth = {0: 0}
+    for node in range(1, 100):
+        parent[node] = node - 1
+        depth[node] = node
+    for node in range(100):
+        parent[200 + node] = node
+        depth[200 + node] = node + 1
+    lift = Lifting(0, parent, depth)
+    assert lift.ancestor(99, 0) == 99
+    assert lift.ancestor(99, 37) == 62
+    assert lift.ancestor(99, 99) == 0
+    assert lift.lca(99, 99) == 99
+    assert lift.lca(99, 40) == 40
+    assert lift.lca(240, 263) == 40
+    assert lift.lca(263, 240) == 40
+    assert lift.lca(200, 299) == 0
+    assert lift.lca(299, 99) == 99
+
+
+def test_lifting_root():
+    lift = Lifting('r', {}, {'r': 0})
+    assert lift.lca('r', 'r') == 'r'
+    assert lift.ancestor('r', 0) == 'r'
@@ -0,0 +1,88 @@
+import pickle
+import sys
+import pytest
+from envy.deco import expr
+from envy.deco.block import TempVar, FOLD_ALL
+from envy.deco.expr.var import ExprVar
+from envy.deco.expr.const import ExprConst
+from envy.deco.expr.cmp import ExprEq
+
+# ints hash modulo this, so val and val + HASH_MOD intern under one hash.
+HASH_MOD = sys.hash_info.modulus
+
+
+@pytest.fixture
+def abx():
+    return [ExprVar(TempVar(name, 0xffffffff)) for name in 'abx']
+
+
+def test_same_object(abx):
+    a, b, x = abx
+    res = (a + 1) + b
+    assert a + (b + 1) is res
+    assert (x + b).fold({x.var: a + 1}, FOLD_ALL) is res
+    const = ExprConst(0x4321)
+    assert pickle.loads(pickle.dumps(const)) is const
+    assert ExprEq(ExprVar(a.var), ExprVar(b.var)) is ExprEq(a, b)
+    assert ExprEq(a, b) is not ExprEq(b, a)
+
+
+def test_collision():
+    val = 0x1234
+    first = ExprConst(val)
+    other = ExprConst(val + HASH_MOD)
+    assert hash(first) == hash(other)
+    assert first is not other
+    assert ExprConst(val) is first
+    assert ExprConst(val + HASH_MOD) is other
+
+
+def test_dropped():
+    # the one live expression is found, whichever died.
+    val = 0x5678
+    first = ExprConst(val)
+    other = ExprConst(val + HASH_MOD)
+    del first
+    expr.sweep()
+    assert ExprConst(val + HASH_MOD) is other
+    again = ExprConst(val)
+    assert again.val == val
+    assert ExprConst(val) is again
+    assert ExprConst(val + HASH_MOD) is other
+
+
+def test_released(abx):
+    # the table doesn't keep dead expressions, or anything they hold.
+    a, b, x = abx
+    expr.sweep()
+    before = len(expr.interned)
+    sums = [a + ExprConst(0x100000 + idx) for idx in range(1000)]
+    kept = sums[0]
+    assert len(expr.interned) >= before + 2000
+    del sums
+    expr.sweep()
+    assert len(expr.interned) <= before + 2
+    assert a + 0x100000 is kept
+
+
+def test_fold_memo(abx, monkeypatch):
+    a, b, x = abx
+    tree = (x + b) & 0xff
+    runs = []
+    orig = type(tree)._fold
+
+    def counted(self, vars_, reason):
+        runs.append(self)
+        return orig(self, vars_, reason)
+
+    monkeypatch.setattr(type(tree), '_fold', counted)
+    expr.fold_memo.clear()
+    res = tree.fold({x.var: a + 1}, FOLD_ALL)
+    assert res is ((a + 1) + b) & 0xff
+    # another map with the same binding hits, vars it doesn't mention
+    # don't matter.
+    assert tree.fold({x.var: a + 1, a.var: 5}, FOLD_ALL) is res
+    assert len(runs) == 1
+    # a rebound var doesn't.
+    assert tree.fold({x.var: a + 2}, FOLD_ALL) is ((a + 2) + b) & 0xff
+    assert len(runs) == 2
@@ -0,0 +1,18 @@
+# clear b16 $r5; bra 0x5; and $r0 $r5 0x7f; ret -- none of the live bits
+# of $r0 survive the clear, so findlive drops the assign feeding the
+# branch's outregs.
+DEAD_OUT = bytes.fromhex('7d54f40e03c4507ff800')
+
+
+def test_dead_out(decompile):
+    out = decompile(DEAD_OUT)
+    assert 'return func_0_5_0' in out
+    assert '= 0x0' in out
+
+# mov $r0 0x1234, then 3000 blocks of bra to the next one, then ret.
+LONG_CHAIN = bytes.fromhex('f1073412') + bytes.fromhex('f40e03') * 3000 + bytes.fromhex('f800')
+
+
+def test_long_chain(decompile):
+    # $r0 is live back through every block, far past the recursion limit.
+    assert 'return 4660' in decompile(LONG_CHAIN)
@@ -0,0 +1,77 @@
+import pytest
+from conftest import falcon_world, printed
+from test_world import recursive_code
+
+# call 0x10; ret, then at 0x10: mov $r0 0x1234; ret
+CALL = bytes.fromhex('f5211000f800').ljust(0x10, b'\0') + bytes.fromhex('f1073412f800')
+
+
+def functions(*funcs):
+    # one function every 0x100 bytes.
+    return b''.join(bytes.fromhex(func).ljust(0x100, b'\0') for func in funcs)
+
+
+# mutual recursion where a member's signature grows after its callers
+# ran, they have to rerun in the same worker.
+MUTUAL = [
+    functions(
+        'fda800c478f5fee800b096c1fc20bb0e04f43305f51e0a00f950f5210001c4c080f8',
+        'f5210002fd6604bd94973fcc904566f5210000f8',
+        'd0b459c5e428f1475dadbb4a0c90b073f800bd94cf1daabbb200f8'),
+    functions(
+        'f5210001fd6001f5210002bb3305d02b84bdb4d037c1fdbf0597aa27f8',
+        'f1c787f192b761f50c1300bb0605f1d76889f5210000f51b0400f8',
+        'bbfb07f4320290d2e7bbb10cc40a64cfe35ef1c7fe06f137649afc40c43666f5100400f8'),
+    functions(
+        '974e9ac6e2abf1f70001f9f5fdf905f197844cfd8f06b0165b959e02f177e286f8',
+        'f5210002bb4404d0b569f107146af5210000d02bc3f8',
+        'cfccebfe4801fe2800b0363bf08c01f167447b973408fc80f08c05f8'),
+]
+
+# a callee processed nested runs once, whatever it dirties waits for the
+# next turn.
+NESTED = functions(
+    'f12704e6cfaa99bbb400f5210001b0e6f3f4330bbba90cf51b0400f8',
+    'f5090800f5210001f5210002c56745f5210002f5210002cf65c1f960f8',
+    '974270b0663190f78ff07c0bbb2b02f8')
+
+
+def test_call(decompile):
+    # the caller runs in a worker after its callee is settled.
+    assert decompile(CALL, jobs=2) == decompile(CALL)
+
+
+def test_recursive(decompile):
+    code = recursive_code()
+    assert decompile(code, jobs=2) == decompile(code)
+
+
+@pytest.mark.parametrize('code', MUTUAL + [NESTED], ids=['mutual1', 'mutual2', 'mutual3', 'nested'])
+def test_same_fixpoint(decompile, code):
+    assert decompile(code, jobs=2) == decompile(code)
+
+
+@pytest.mark.parametrize('code', [recursive_code(), NESTED], ids=['recursive', 'nested'])
+def test_deferred(code):
+    # callees past max_nesting go through the scheduler.
+    outs = []
+    for jobs in (None, 2):
+        world = falcon_world(code)
+        world.max_nesting = 0
+        world.process(jobs=jobs)
+        assert not world.dirties
+        outs.append(printed(world))
+    assert outs[0] == outs[1]
+
+
+@pytest.mark.parametrize('jobs', [None, 2])
+@pytest.mark.parametrize('code', [recursive_code(), NESTED] + MUTUAL, ids=['recursive', 'nested', 'mutual1', 'mutual2', 'mutual3'])
+def test_nesting_limit(code, jobs):
+    # deferred callees make for the same fixpoint as nested ones.
+    outs = []
+    for max_nesting in (0, 1000):
+        world = falcon_world(code)
+        world.max_nesting = max_nesting
+        world.process(jobs=jobs)
+        outs.append(printed(world))
+    assert outs[0] == outs[1]
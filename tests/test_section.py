@@ -0,0 +1,99 @@
+import random
+import pytest
+from envy.section import ImageSection, IntervalIndex
+from conftest import falcon_world
+
+
+def test_get():
+    section = ImageSection(0x100, bytes(range(16)))
+    assert section.get(0x100, 1) == 0x00
+    assert section.get(0x101, 2) == 0x0201
+    assert section.get(0x104, 4) == 0x07060504
+    assert section.get(0x108, 8) == 0x0f0e0d0c0b0a0908
+    assert section.get(0x103, 3) == 0x050403
+    # reads past the end are zero-padded.
+    assert section.get(0x10e, 4) == 0x0f0e
+
+
+def test_slice():
+    data = bytearray(range(16))
+    section = ImageSection(0x100, data)
+    view = section[0x104:0x108]
+    assert bytes(view) == bytes([4, 5, 6, 7])
+    # a view, not a copy.
+    data[5] = 0xff
+    assert view[1] == 0xff
+
+
+def test_open(tmp_path):
+    fname = tmp_path / 'image.bin'
+    fname.write_bytes(bytes(range(32)))
+    section = ImageSection.open(0x1000, str(fname))
+    assert section.end == 0x1020
+    assert section.get(0x101c, 4) == 0x1f1e1d1c
+    assert bytes(section[0x1000:0x1004]) == bytes([0, 1, 2, 3])
+
+
+def test_open_empty(tmp_path):
+    fname = tmp_path / 'empty.bin'
+    fname.write_bytes(b'')
+    section = ImageSection.open(0x1000, str(fname))
+    assert section.end == 0x1000
+    with pytest.raises(IndexError):
+        section.lookup(0x1000)
+
+
+def test_interval_index():
+    index = IntervalIndex()
+    index.set_ranges('a', [(0x10, 0x20), (0x18, 0x30)])
+    index.set_ranges('b', [(0x28, 0x40)])
+    assert index.lookup(0x0f) == set()
+    assert index.lookup(0x10) == {'a'}
+    assert index.lookup(0x2f) == {'a', 'b'}
+    assert index.lookup(0x30) == {'b'}
+    assert index.lookup(0x40) == set()
+    assert index.overlaps() == [(0x28, 0x30, {'a', 'b'})]
+    assert index.ranges['a'] == [(0x10, 0x30)]
+    # replacing and dropping leave no stale bounds behind.
+    index.set_ranges('a', [(0x30, 0x38)])
+    assert index.lookup(0x10) == set()
+    assert index.overlaps() == [(0x30, 0x38, {'a', 'b'})]
+    index.set_ranges('a', [])
+    index.set_ranges('b', [])
+    assert index.bounds == []
+    assert index.ranges == {}
+
+
+def test_interval_index_random():
+    # against a plain set of addresses per object.
+    rnd = random.Random(0)
+    for _ in range(200):
+        index = IntervalIndex()
+        truth = {}
+        for _ in range(10):
+            obj = rnd.randrange(4)
+            ranges = []
+            for _ in range(rnd.randrange(3)):
+                start = rnd.randrange(20)
+                ranges.append((start, start + rnd.randrange(6)))
+            index.set_ranges(obj, ranges)
+            truth[obj] = {addr for start, end in ranges for addr in range(start, end)}
+            for addr in range(-2, 30):
+                assert index.lookup(addr) == {obj for obj, addrs in truth.items() if addr in addrs}
+            for idx in range(1, len(index.owners)):
+                assert index.owners[idx] != index.owners[idx - 1]
+
+
+def test_find_owners():
+    # call 0x10; ret, then at 0x10: mov $r0 0x1234; ret
+    world = falcon_world(bytes.fromhex('f5211000f800').ljust(0x10, b'\0') + bytes.fromhex('f1073412f800'))
+    world.process()
+    section = world.sections[0]
+    caller, callee = world.objects
+    assert section.find_owners(0) == {caller}
+    assert section.find_owners(0x5) == {caller}
+    assert section.find_owners(0x8) == set()
+    assert section.find_owners(0x10) == {callee}
+    assert section.overlaps() == []
+    with pytest.raises(IndexError):
+        section.find_owners(0x100)
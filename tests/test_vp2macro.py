@@ -0,0 +1,41 @@
+import random
+import pytest
+from envy.section import ImageSection
+from envy.isa import vp2macro
+from envy.deco import DecodeError
+
+
+def vp2_code(num):
+    # every 8th word has predicate bits, which don't decode.
+    rnd = random.Random(0)
+    words = [rnd.getrandbits(64) | 1 if idx % 8 == 0 else rnd.getrandbits(61) << 3 for idx in range(num)]
+    return ImageSection(0, b''.join(word.to_bytes(8, 'little') for word in words))
+
+
+def fields(insn):
+    if isinstance(insn, DecodeError):
+        return str(insn)
+    return [insn.pos, insn.end, insn.opcode, insn.cf] + [getattr(insn, name) for name, _, _, _ in vp2macro.FIELDS]
+
+
+def one_by_one(code):
+    res = []
+    for pos in range(code.base, code.end, 8):
+        try:
+            res.append(fields(vp2macro.isa.decode_insn(code, pos)))
+        except DecodeError as err:
+            res.append(str(err))
+    return res
+
+
+@pytest.mark.parametrize('mode', ['python', 'numpy'])
+def test_decode_range(mode, monkeypatch):
+    if mode == 'numpy':
+        if vp2macro.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(vp2macro, 'np', None)
+    code = vp2_code(64)
+    insns = vp2macro.isa.decode_range(code, code.base, code.end)
+    assert sorted(insns) == list(range(code.base, code.end, 8))
+    assert [fields(insns[pos]) for pos in sorted(insns)] == one_by_one(code)
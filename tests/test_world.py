@@ -0,0 +1,69 @@
+import pytest
+from envy.section import ImageSection
+from envy.isa.falcon import FalconIsa
+from envy.deco.world import World, Domain
+from conftest import falcon_world
+
+
+def domain_with(*sections):
+    isa = FalconIsa(3)
+    domain = Domain(World(), isa)
+    for section in sections:
+        domain.add_section(isa.codemem, section)
+    return domain
+
+
+def test_find_section():
+    low = ImageSection(0x100, bytes(0x100))
+    high = ImageSection(0x1000, bytes(0x10))
+    mid = ImageSection(0x400, bytes(0x100))
+    # added out of order.
+    domain = domain_with(high, low, mid)
+    space = domain.isa.codemem
+    assert domain.find_section(space, 0x100) is low
+    assert domain.find_section(space, 0x1ff) is low
+    assert domain.find_section(space, 0x480) is mid
+    assert domain.find_section(space, 0x100f) is high
+    for addr in [0, 0xff, 0x200, 0x3ff, 0x500, 0x1010]:
+        with pytest.raises(IndexError):
+            domain.find_section(space, addr)
+
+
+def test_unmapped_space():
+    domain = domain_with(ImageSection(0, bytes(0x10)))
+    with pytest.raises(IndexError):
+        domain.find_section(domain.isa.data, 0)
+
+
+@pytest.mark.parametrize('base, size', [(0x180, 0x10), (0xf0, 0x20), (0x80, 0x200), (0x1f0, 0x10)])
+def test_overlap(base, size):
+    domain = domain_with(ImageSection(0x100, bytes(0x100)))
+    with pytest.raises(ValueError):
+        domain.add_section(domain.isa.codemem, ImageSection(base, bytes(size)))
+    # touching is fine.
+    domain.add_section(domain.isa.codemem, ImageSection(0x200, bytes(0x10)))
+
+
+def recursive_code():
+    # 0x0: call 0x10; ret
+    # 0x10: call 0x20; ret
+    # 0x20: call 0x30; call 0x10; ret
+    # 0x30: mov $r0 0x1234; ret
+    code = bytearray(0x40)
+    code[0x00:0x06] = bytes.fromhex('f5211000f800')
+    code[0x10:0x16] = bytes.fromhex('f5212000f800')
+    code[0x20:0x2a] = bytes.fromhex('f5213000f5211000f800')
+    code[0x30:0x36] = bytes.fromhex('f1073412f800')
+    return bytes(code)
+
+
+def test_sccs():
+    world = falcon_world(recursive_code())
+    world.process()
+    names = [[obj.name for obj in scc] for scc in world.sccs(world.callgraph())]
+    # callees first, the mutual recursion is one SCC.
+    assert names == [['func_30'], ['func_10', 'func_20'], ['func_0']]
+    assert not world.dirties
+    # the leaf is settled before anything calls it, once.
+    assert world.objects[3].nprocessed == 1
+